@@ -0,0 +1,226 @@
+# Procesado offline de grabaciones WAV por bloques, sin abrir la interfaz.
+# Aplica la misma inversión y suma que VisualAudio.callback (opcionalmente
+# con un error de ganancia y un retardo en la antiseñal, para comparar
+# ajustes) y mide la cancelación con el mismo medidor. La entrada se
+# lee con readinto sobre un buffer preasignado (un np.memmap dejaría en
+# memoria residente todas las páginas ya leídas) y la salida se escribe
+# bloque a bloque, así que la memoria no depende de la duración.
+
+import argparse
+import json
+import struct
+import sys
+import time
+
+import numpy as np
+
+from cancelacion import FiltroFIR
+from medidor import MedidorCancelacion
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+BLOQUE = 65536
+
+
+# =======================
+# Lectura y escritura de WAV
+# =======================
+class LectorWav:
+    def __init__(self, ruta):
+        self.ruta = ruta
+        with open(ruta, "rb") as f:
+            riff, _, wave = struct.unpack("<4sI4s", f.read(12))
+            if riff != b"RIFF" or wave != b"WAVE":
+                raise ValueError(f"{ruta}: no es un archivo WAV")
+            formato = None
+            while True:
+                cabecera = f.read(8)
+                if len(cabecera) < 8:
+                    raise ValueError(f"{ruta}: falta el bloque 'data'")
+                nombre, tam = struct.unpack("<4sI", cabecera)
+                if nombre == b"fmt ":
+                    fmt = f.read(tam)
+                    formato, self.canales, self.fs = struct.unpack("<HHI", fmt[:8])
+                    self.bits = struct.unpack("<H", fmt[14:16])[0]
+                    if formato == WAVE_FORMAT_EXTENSIBLE:
+                        formato = struct.unpack("<H", fmt[24:26])[0]
+                elif nombre == b"data":
+                    offset = f.tell()
+                    break
+                else:
+                    f.seek(tam + (tam & 1), 1)
+        if formato is None:
+            raise ValueError(f"{ruta}: falta el bloque 'fmt '")
+
+        ancho = self.bits // 8
+        self.frames = tam // (ancho * self.canales)
+        if formato == WAVE_FORMAT_IEEE_FLOAT and self.bits in (32, 64):
+            dtype, self.escala = np.dtype(f"<f{ancho}"), 1.0
+        elif formato == WAVE_FORMAT_PCM and self.bits == 8:
+            dtype, self.escala = np.dtype(np.uint8), 1 / 128
+        elif formato == WAVE_FORMAT_PCM and self.bits in (16, 32):
+            dtype, self.escala = np.dtype(f"<i{ancho}"), 1 / 2 ** (self.bits - 1)
+        elif formato == WAVE_FORMAT_PCM and self.bits == 24:
+            dtype, self.escala = np.dtype(np.uint8), 1 / 2 ** 31
+        else:
+            raise ValueError(f"{ruta}: formato no soportado ({formato}, {self.bits} bits)")
+        self._dtype = dtype
+        self._offset = offset
+
+    def bloques(self, tam=BLOQUE):
+        # Genera bloques float32 (frames, canales) en [-1, 1]. El array
+        # devuelto se reutiliza en cada iteración.
+        buf = np.empty((tam, self.canales), dtype=np.float32)
+        forma = (tam, self.canales, 3) if self.bits == 24 else (tam, self.canales)
+        leido = np.empty(forma, dtype=self._dtype)
+        bytes_frame = leido.nbytes // tam
+        with open(self.ruta, "rb") as f:
+            f.seek(self._offset)
+            for ini in range(0, self.frames, tam):
+                m = min(tam, self.frames - ini)
+                n = f.readinto(memoryview(leido).cast("B")[:m * bytes_frame])
+                m = n // bytes_frame
+                if m == 0:
+                    return
+                yield self._convertir(leido[:m], buf[:m])
+
+    def _convertir(self, crudo, out):
+        if self.bits == 24:
+            # Se coloca cada muestra en los 3 bytes altos de un int32
+            enteros = np.zeros(crudo.shape[:2] + (4,), dtype=np.uint8)
+            enteros[..., 1:] = crudo
+            crudo = enteros.view("<i4")[..., 0]
+        elif self.bits == 8:
+            crudo = crudo.astype(np.int16) - 128
+        np.multiply(crudo, self.escala, out=out, casting="unsafe")
+        return out
+
+    def duracion(self):
+        return self.frames / self.fs
+
+
+class EscritorWav:
+    # WAV float32 escrito en streaming; los tamaños de la cabecera se
+    # completan al cerrar.
+    def __init__(self, ruta, fs, canales):
+        self.fs = fs
+        self.canales = canales
+        self.frames = 0
+        self._f = open(ruta, "wb")
+        self._f.write(self._cabecera(0))
+
+    def _cabecera(self, bytes_datos):
+        ancho = 4 * self.canales
+        riff = min(36 + bytes_datos, 0xFFFFFFFF)
+        return (struct.pack("<4sI4s", b"RIFF", riff, b"WAVE")
+                + struct.pack("<4sIHHIIHH", b"fmt ", 16, WAVE_FORMAT_IEEE_FLOAT, self.canales,
+                              self.fs, self.fs * ancho, ancho, 32)
+                + struct.pack("<4sI", b"data", min(bytes_datos, 0xFFFFFFFF)))
+
+    def escribir(self, bloque):
+        bloque = np.ascontiguousarray(bloque, dtype="<f4")
+        self._f.write(memoryview(bloque).cast("B"))
+        self.frames += len(bloque)
+
+    def cerrar(self):
+        self._f.seek(0)
+        self._f.write(self._cabecera(self.frames * 4 * self.canales))
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+# =======================
+# Pipeline de cancelación
+# =======================
+def invertir(bloques, ganancia=1.0, retardo=0):
+    # Etapa del pipeline: (original, invertido, residual) por bloque, con
+    # la misma cuenta que el callback en tiempo real. La antiseñal es
+    # -ganancia * x[n - retardo]; con los valores por defecto, -x.
+    inv = res = None
+    filtros = None
+    for x in bloques:
+        if inv is None or inv.shape[0] < x.shape[0]:
+            inv = np.empty_like(x)
+            res = np.empty_like(x)
+            filtros = None
+        i = inv[:len(x)]
+        r = res[:len(x)]
+        if ganancia == 1.0 and retardo == 0:
+            np.negative(x, out=i)
+        else:
+            if filtros is None:
+                filtros = [(FiltroFIR([-ganancia], inv.shape[0], retardo), np.empty(inv.shape[0]))
+                           for _ in range(x.shape[1])]
+            for canal, (filtro, y) in enumerate(filtros):
+                i[:, canal] = filtro.filtrar(x[:, canal], y[:len(x)])
+        np.add(x, i, out=r)
+        yield x, i, r
+
+
+def procesar_wav(entrada, salida_invertida=None, salida_residual=None, bloque=BLOQUE,
+                 ganancia=1.0, retardo=0):
+    lector = LectorWav(entrada)
+    escritores = [EscritorWav(ruta, lector.fs, lector.canales) if ruta else None
+                  for ruta in (salida_invertida, salida_residual)]
+    medidores = [MedidorCancelacion(lector.fs) for _ in range(lector.canales)]
+    inicio = time.perf_counter()
+    try:
+        for x, inv, res in invertir(lector.bloques(bloque), ganancia, retardo):
+            for canal, medidor in enumerate(medidores):
+                medidor.agregar(x[:, canal], res[:, canal])
+            for escritor, datos in zip(escritores, (inv, res)):
+                if escritor is not None:
+                    escritor.escribir(datos)
+    finally:
+        for escritor in escritores:
+            if escritor is not None:
+                escritor.cerrar()
+    segundos = time.perf_counter() - inicio
+    return {
+        "frames": lector.frames,
+        "duracion_s": lector.duracion(),
+        "tiempo_s": segundos,
+        "velocidad": lector.duracion() / segundos if segundos > 0 else float("inf"),
+        "ganancia": ganancia,
+        "retardo": retardo,
+        "canales": [medidor.estadisticas() for medidor in medidores],
+        "resumen": [medidor.resumen() for medidor in medidores],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="procesar-wav",
+        description="Invierte y suma una grabación WAV por bloques, como el callback en vivo.")
+    parser.add_argument("entrada", help="archivo WAV de entrada")
+    parser.add_argument("--invertida", help="WAV de salida con la señal invertida")
+    parser.add_argument("--residual", help="WAV de salida con la suma original + invertida")
+    parser.add_argument("--bloque", type=int, default=BLOQUE, help="muestras por bloque")
+    parser.add_argument("--ganancia", type=float, default=1.0,
+                        help="ganancia de la antiseñal (1 = inversión exacta)")
+    parser.add_argument("--retardo", type=int, default=0,
+                        help="retardo de la antiseñal en muestras")
+    parser.add_argument("--informe", help="JSON con las medidas de cancelación por canal")
+    args = parser.parse_args(argv)
+
+    r = procesar_wav(args.entrada, args.invertida, args.residual, args.bloque,
+                     args.ganancia, args.retardo)
+    print(f"{r['frames']} muestras ({r['duracion_s']:.1f} s de audio) en {r['tiempo_s']:.2f} s,"
+          f" {r['velocidad']:.0f}x tiempo real")
+    for canal, texto in enumerate(r.pop("resumen")):
+        print(f"canal {canal}: {texto}")
+    if args.informe:
+        with open(args.informe, "w") as f:
+            json.dump(r, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,223 @@
+# Backends de audio con la interfaz de sounddevice.Stream: la tarjeta de
+# sonido o un stream simulado que llama al mismo callback desde un hilo
+# propio, con bloques de un WAV o de tonos sintéticos, al ritmo del reloj o
+# tan rápido como pueda. El simulado no necesita PortAudio y es
+# determinista, así que sirve para probar y medir el callback sin tarjeta.
+
+import sys
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from audio_offline import LectorWav
+from cancelacion import FiltroFIR
+from telemetria import BANDERAS
+
+BACKENDS = ("sounddevice", "simulado")
+RITMOS = ("reloj", "maximo")
+
+# Lo que el callback recibe como `time` y `status` en sounddevice
+TiempoSimulado = namedtuple("TiempoSimulado",
+                            "currentTime inputBufferAdcTime outputBufferDacTime")
+
+
+class EstadoSimulado:
+    # Como sounddevice.CallbackFlags: falso si no hay ninguna bandera
+    __slots__ = BANDERAS
+
+    def __init__(self):
+        self.limpiar()
+
+    def limpiar(self):
+        for bandera in BANDERAS:
+            setattr(self, bandera, False)
+
+    def __bool__(self):
+        return any(getattr(self, bandera) for bandera in BANDERAS)
+
+
+def canales_entrada_salida(channels):
+    # channels=2 o channels=(1, 2), como en sounddevice
+    if isinstance(channels, int):
+        return channels, channels
+    return tuple(channels)
+
+
+# =======================
+# Fuentes
+# =======================
+# Generadores de bloques float32 (bloque, canales). El array devuelto se
+# reutiliza en cada iteración.
+def tono(fs, bloque, canales=1, frecuencias=(440.0,), amplitud=0.5, ruido=0.0, semilla=0):
+    # Suma de senos de igual amplitud, con fase continua entre bloques, y
+    # ruido blanco opcional
+    buf = np.empty((bloque, canales), dtype=np.float32)
+    w = 2 * np.pi * np.asarray(frecuencias, dtype=float) / fs
+    n = np.arange(bloque)
+    fase = np.zeros(len(w))
+    rng = np.random.default_rng(semilla)
+    while True:
+        mono = np.sin(fase[:, None] + np.multiply.outer(w, n)).sum(axis=0)
+        mono *= amplitud / len(w)
+        if ruido:
+            mono += ruido * rng.standard_normal(bloque)
+        buf[:] = mono[:, None]
+        fase = (fase + w * bloque) % (2 * np.pi)
+        yield buf
+
+
+def wav(ruta, bloque, canales=1, bucle=True):
+    # Bloques de un WAV; los canales que le falten al archivo repiten el
+    # primero y el último bloque se completa con ceros
+    lector = LectorWav(ruta)
+    buf = np.zeros((bloque, canales), dtype=np.float32)
+    while True:
+        for x in lector.bloques(bloque):
+            m = len(x)
+            c = min(canales, x.shape[1])
+            buf[:m, :c] = x[:, :c]
+            buf[:m, c:] = x[:, :1]
+            buf[m:] = 0
+            yield buf
+        if not bucle:
+            return
+
+
+# =======================
+# Streams
+# =======================
+class StreamSimulado:
+    # eco: respuesta al impulso de la ruta altavoz -> micrófono. Con ella el
+    # micrófono oye la primera salida con el retardo de `latency`, como en
+    # la sala; sin ella la fuente entra tal cual (una entrada de línea).
+    def __init__(self, samplerate, blocksize, channels, callback, fuente=None,
+                 ritmo="reloj", latency="high", dtype="float32", eco=None):
+        if ritmo not in RITMOS:
+            raise ValueError(f"ritmo desconocido: {ritmo}")
+        if dtype != "float32":
+            raise ValueError("el stream simulado sólo genera float32")
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.channels = canales_entrada_salida(channels)
+        self.callback = callback
+        self.ritmo = ritmo
+        self.periodo = blocksize / samplerate
+        # Latencia de la muestra que entra por el ADC a la que sale por el
+        # DAC: uno o dos bloques, como en una tarjeta con doble buffer
+        if isinstance(latency, str):
+            latency = self.periodo * (1 if latency == "low" else 2)
+        self.latency = latency
+        self.fuente = fuente if fuente is not None else tono(samplerate, blocksize, self.channels[0])
+        self._salida = np.zeros((blocksize, self.channels[1]), dtype=np.float32)
+        self._eco = None
+        if eco is not None:
+            # El retardo del lazo es de al menos un bloque: lo que sale en
+            # un bloque se oye, como pronto, en el siguiente
+            retardo = max(blocksize, round(self.latency * samplerate))
+            self._eco = FiltroFIR(eco, blocksize, retardo - blocksize)
+            self._oido = np.zeros(blocksize)
+            self._entrada = np.empty((blocksize, self.channels[0]), dtype=np.float32)
+        self._estado = EstadoSimulado()
+        self._parar = threading.Event()
+        self._hilo = None
+        self.bloques = 0
+        self.retrasados = 0
+        self._t0 = None
+
+    @property
+    def active(self):
+        return self._hilo is not None and self._hilo.is_alive()
+
+    def start(self):
+        self._parar.clear()
+        self._hilo = threading.Thread(target=self.ejecutar, daemon=True)
+        self._hilo.start()
+
+    def stop(self):
+        self._parar.set()
+        if self._hilo is not None and self._hilo is not threading.current_thread():
+            self._hilo.join()
+        self._hilo = None
+
+    def close(self):
+        self.stop()
+
+    def ejecutar(self, n=None):
+        # Llama al callback con los siguientes n bloques (o hasta que se
+        # acabe la fuente o se pare) en el hilo actual y devuelve cuántos
+        # ha procesado. Se puede llamar varias veces: la fuente y el reloj
+        # continúan donde se quedaron.
+        procesados = 0
+        if self._t0 is None:
+            self._t0 = time.perf_counter()
+        # Se comprueba antes de pedir el bloque, que si no se perdería
+        while (n is None or procesados < n) and not self._parar.is_set():
+            entrada = next(self.fuente, None)
+            if entrada is None:
+                break
+            # Instante en que el bloque termina de llegar por el ADC
+            listo = self._t0 + (self.bloques + 1) * self.periodo
+            if self.ritmo == "reloj":
+                ahora = time.perf_counter()
+                if listo > ahora:
+                    time.sleep(listo - ahora)
+                elif ahora - listo > self.periodo:
+                    # Más de un bloque de retraso: la salida se habría
+                    # quedado sin datos
+                    self._estado.output_underflow = True
+                    self.retrasados += 1
+                ahora = time.perf_counter()
+            else:
+                ahora = listo
+            adc = listo - self.periodo
+            tiempo = TiempoSimulado(ahora, adc, adc + self.latency)
+            if self._eco is not None:
+                np.add(entrada, self._oido[:, None], out=self._entrada, casting="unsafe")
+                entrada = self._entrada
+            self.callback(entrada, self._salida, self.blocksize, tiempo, self._estado)
+            if self._eco is not None:
+                # Lo que se oirá en el bloque siguiente
+                self._eco.filtrar(self._salida[:, 0], self._oido)
+            self._estado.limpiar()
+            self.bloques += 1
+            procesados += 1
+        return procesados
+
+
+class ErrorAudio(OSError):
+    # Sin PortAudio, sin dispositivo o con el dispositivo ocupado; se puede
+    # capturar sin importar sounddevice
+    pass
+
+
+def abrir_stream(backend, samplerate, blocksize, channels, callback, latency="high",
+                 **opciones):
+    # opciones: fuente y ritmo del stream simulado
+    if backend == "sounddevice":
+        try:
+            import sounddevice
+        except (ImportError, OSError) as e:
+            raise ErrorAudio(f"sounddevice no disponible: {e}") from e
+        try:
+            return sounddevice.Stream(samplerate=samplerate, blocksize=blocksize,
+                                      channels=channels, callback=callback, dtype="float32",
+                                      latency=latency)
+        except sounddevice.PortAudioError as e:
+            raise ErrorAudio(str(e)) from e
+    if backend == "simulado":
+        return StreamSimulado(samplerate, blocksize, channels, callback, latency=latency,
+                              **opciones)
+    raise ValueError(f"backend desconocido: {backend}")
+
+
+def arrancar(stream):
+    # stream.start() con los errores de PortAudio como ErrorAudio
+    try:
+        stream.start()
+    except Exception as e:
+        sounddevice = sys.modules.get("sounddevice")
+        if sounddevice is not None and isinstance(e, sounddevice.PortAudioError):
+            raise ErrorAudio(str(e)) from e
+        raise
@@ -0,0 +1,333 @@
+# Benchmarks sin pantalla (Qt offscreen + Agg) del simulador, los gráficos,
+# el callback de audio y la calculadora.
+#
+#   python benchmarks.py --salida base.json
+#   python benchmarks.py --salida nuevo.json --base base.json
+#
+# Cada caso se mide varias veces y se guarda la mediana del tiempo por
+# iteración; el pico de memoria se mide aparte con tracemalloc, porque
+# tracemalloc ralentiza lo que mide.
+
+import os
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+MALLAS = (500, 5000, 50000)
+# Frames por bloque del motor en los casos del simulador, y frames
+# dibujados en cada repetición de los casos de dibujo (al menos dos bloques,
+# para que cada repetición incluya el mismo número de bloques calculados)
+FRAMES = (16, 64, 256)
+FRAMES_DIBUJO = 128
+BLOQUES = (128, 256, 512, 1024, 2048)
+REPETICIONES = 3
+
+# Widgets creados por los casos; se cierran al acabar cada caso para que Qt
+# no pinte objetos que Python ya ha liberado
+_WIDGETS = []
+
+
+def _widget(w):
+    _WIDGETS.append(w)
+    return w
+
+
+def _cerrar_widgets(app):
+    for w in _WIDGETS:
+        w.close()
+        w.deleteLater()
+    app.processEvents()
+    _WIDGETS.clear()
+
+
+# Lo que un preparar() deja en marcha (hilos, archivos); medir() lo deshace
+# al terminar con cada función medida
+_LIMPIEZA = []
+
+
+def _al_terminar(funcion):
+    _LIMPIEZA.append(funcion)
+
+
+def _limpiar():
+    while _LIMPIEZA:
+        _LIMPIEZA.pop()()
+
+
+def medir(preparar, iteraciones, repeticiones=REPETICIONES):
+    # preparar() devuelve la función a medir (una llamada = una iteración)
+    try:
+        funcion = preparar()
+        funcion()
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            for _ in range(iteraciones):
+                funcion()
+            tiempos.append((time.perf_counter() - inicio) / iteraciones)
+    finally:
+        _limpiar()
+
+    try:
+        funcion = preparar()
+        tracemalloc.start()
+        for _ in range(iteraciones):
+            funcion()
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        _limpiar()
+    return {
+        "ms_por_iteracion": 1000 * float(np.median(tiempos)),
+        "ms_min": 1000 * min(tiempos),
+        "pico_kb": pico / 1024,
+        "iteraciones": iteraciones,
+    }
+
+
+# =======================
+# Casos
+# =======================
+def casos_simulador(od, app):
+    from motor_ondas import MotorOndas
+    for malla in MALLAS:
+        # En mallas grandes el motor recorta el bloque; cada longitud real
+        # se mide una vez
+        motor = MotorOndas(np.empty(malla))
+        for frames in sorted({motor.frames_por_bloque(f) for f in FRAMES}):
+            for modo in ("simple", "super", "est"):
+                def preparar(malla=malla, frames=frames, modo=modo):
+                    sim = _widget(od.SimuladorOndas())
+                    od.planificador().quitar(sim)
+                    sim.resize(1000, 800)
+                    sim.fijar_malla(malla)
+                    sim.frames_bloque = frames
+                    sim.show()
+                    sim.setModo(modo)
+
+                    def paso():
+                        # processEvents incluye el repintado de pyqtgraph
+                        sim.actualizar()
+                        app.processEvents()
+                    return paso
+                iteraciones = max(FRAMES_DIBUJO, 2 * frames)
+                yield ("SimuladorOndas.actualizar", {"malla": malla, "frames": frames, "modo": modo},
+                       preparar, iteraciones)
+
+    def preparar():
+        from campo2d import Campo2D, Fuente
+        ejes = np.linspace(-2 * np.pi, 2 * np.pi, 1000)
+        campo = Campo2D(ejes, ejes, np.pi)
+        campo.agregar(Fuente(-np.pi, 0, 1, 0))
+        campo.agregar(Fuente(-2.5, 0, 1, np.pi))
+        posiciones = iter(np.linspace(-3, 3, 1000))
+        return lambda: campo.cambiar(1, x=next(posiciones))
+    yield "Campo2D.cambiar", {"malla": 1000}, preparar, 100
+
+    def preparar():
+        from ecuacion_ondas import SolverOndas1D, pulso
+        x = np.linspace(0, 4 * np.pi, 100_000)
+        solver = SolverOndas1D(x, 5 / np.pi, 0.1, "absorbente")
+        solver.iniciar(pulso(x, np.pi, 0.5))
+        return solver.paso
+    yield "SolverOndas1D.paso", {"malla": 100_000}, preparar, 1000
+
+    def preparar():
+        from particulas import Particulas, reposo
+        particulas = Particulas(*reposo(5000, 4 * np.pi, "plano"), historia=16)
+        fases = iter(np.linspace(0, 100, 10_000))
+
+        def paso():
+            particulas.estacionaria(4 * np.sin(next(fases)), np.pi)
+            particulas.trazas()
+        return paso
+    yield "Particulas.estacionaria", {"particulas": 5000, "rastro": 16}, preparar, 1000
+
+
+def casos_graficos(od, app):
+    for malla in MALLAS:
+        def preparar(malla=malla):
+            canvas = _widget(od.SuperposicionMatplotlib())
+            canvas.resize(800, 600)
+            canvas.show()
+            x = np.linspace(0, 4 * np.pi, malla)
+            y1, y2 = np.sin(x), np.cos(x)
+
+            def paso():
+                canvas.update_plot(x, y1, y2)
+                app.processEvents()
+            return paso
+        yield "SuperposicionMatplotlib.update_plot", {"malla": malla}, preparar, FRAMES_DIBUJO
+
+    def preparar():
+        canvas = _widget(od.EstacionariaMatplotlib())
+        canvas.resize(500, 200)
+        canvas.show()
+        estado = {"t": 0.0}
+
+        def paso():
+            estado["t"] += 0.1
+            canvas.update_plot(estado["t"], np.sin(estado["t"]))
+            app.processEvents()
+        return paso
+    yield "EstacionariaMatplotlib.update_plot", {}, preparar, FRAMES_DIBUJO
+
+
+def casos_audio(od, app):
+    for bloque in BLOQUES:
+        for modo in ("inversion", "fxlms"):
+            def preparar(bloque=bloque, modo=modo):
+                audio = _widget(od.VisualAudio())
+                audio.configurar(audio.SAMPLERATE, bloque)
+                audio.modo = modo
+                rng = np.random.default_rng(0)
+                indata = rng.standard_normal((bloque, 1)).astype(np.float32)
+                outdata = np.zeros((bloque, 1), dtype=np.float32)
+                return lambda: audio.callback(indata, outdata, bloque, None, None)
+            yield "VisualAudio.callback", {"bloque": bloque, "modo": modo}, preparar, 200
+
+    for bloque in (64, 1024):
+        def preparar(bloque=bloque):
+            # El callback conducido por el stream simulado, sin esperar al reloj
+            import backend_audio
+            # Misma latencia y ruta secundaria que VisualAudio.abrir_stream
+            audio = _widget(od.VisualAudio())
+            audio.configurar(audio.SAMPLERATE, bloque, ruta_secundaria=audio.ECO_SIMULADO)
+            audio.modo = "fxlms"
+            latencia = "low" if bloque <= audio.BLOQUE_BAJA_LATENCIA else "high"
+            stream = backend_audio.StreamSimulado(
+                audio.SAMPLERATE, bloque, 1, audio.callback, ritmo="maximo", latency=latencia,
+                fuente=backend_audio.tono(audio.SAMPLERATE, bloque, ruido=0.05),
+                eco=audio.ECO_SIMULADO)
+            return lambda: stream.ejecutar(100)
+        yield "StreamSimulado.ejecutar(100)", {"bloque": bloque}, preparar, 20
+
+    def preparar():
+        # Lo que llega en un frame a 60 fps, original y residual
+        espectrograma = od.Espectrograma(44100, canales=2)
+        x = np.random.default_rng(0).standard_normal((2, 735)).astype(np.float32)
+        return lambda: espectrograma.agregar(x)
+    yield "Espectrograma.agregar", {"muestras": 735}, preparar, 500
+
+    for bloque in (64, 1024):
+        def preparar(bloque=bloque):
+            from medidor import MedidorCancelacion
+            medidor = MedidorCancelacion(44100)
+            rng = np.random.default_rng(0)
+            x = rng.standard_normal(bloque).astype(np.float32)
+            e = 0.1 * x
+            return lambda: medidor.agregar(x, e)
+        yield "MedidorCancelacion.agregar", {"bloque": bloque}, preparar, 2000
+
+    def preparar():
+        # Lo que añade la grabación al callback; el hilo escritor vacía la
+        # cola en un directorio temporal, que se borra al parar
+        from grabadora import GrabadoraSesion
+        directorio = tempfile.TemporaryDirectory()
+        grabadora = GrabadoraSesion(os.path.join(directorio.name, "sesion.f32"), 44100,
+                                    formato="f32")
+        grabadora.iniciar()
+        _al_terminar(directorio.cleanup)
+        _al_terminar(grabadora.detener)
+        x = np.random.default_rng(0).standard_normal(64).astype(np.float32)
+        return lambda: grabadora.agregar(x, x, x)
+    yield "GrabadoraSesion.agregar", {"bloque": 64}, preparar, 2000
+
+
+def casos_calculadora(od, app):
+    def preparar():
+        calc = _widget(od.CalculadoraOndas())
+        calc.inputs["Frecuencia (f)"].setText("440")
+        calc.inputs["Longitud de onda (λ)"].setText("0.78")
+        return calc.calcular
+    yield "CalculadoraOndas.calcular", {}, preparar, 200
+
+
+# =======================
+# Ejecución y comparación
+# =======================
+def ejecutar(filtro=None):
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    import oladefinitivo as od
+
+    resultados = []
+    for grupo in (casos_simulador, casos_graficos, casos_audio, casos_calculadora):
+        for nombre, parametros, preparar, iteraciones in grupo(od, app):
+            if filtro and filtro not in nombre:
+                continue
+            r = medir(preparar, iteraciones)
+            _cerrar_widgets(app)
+            r.update(nombre=nombre, parametros=parametros)
+            resultados.append(r)
+            print(f"{nombre:38s} {_texto(parametros):40s} {r['ms_por_iteracion']:9.3f} ms"
+                  f"  pico {r['pico_kb']:9.1f} kB", flush=True)
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "plataforma": platform.platform(),
+        "resultados": resultados,
+    }
+
+
+def _texto(parametros):
+    return " ".join(f"{k}={v}" for k, v in parametros.items())
+
+
+def _clave(r):
+    return r["nombre"], _texto(r["parametros"])
+
+
+def comparar(actual, base, umbral=0.10):
+    # Cociente actual/base del tiempo por iteración; > 1 es más lento
+    previos = {_clave(r): r for r in base["resultados"]}
+    peores = 0
+    print(f"\nComparación con la base del {base.get('fecha', '?')}:")
+    for r in actual["resultados"]:
+        previo = previos.get(_clave(r))
+        if previo is None:
+            continue
+        cociente = r["ms_por_iteracion"] / previo["ms_por_iteracion"]
+        marca = ""
+        if cociente > 1 + umbral:
+            marca = "  <-- más lento"
+            peores += 1
+        elif cociente < 1 - umbral:
+            marca = "  (más rápido)"
+        nombre, parametros = _clave(r)
+        print(f"{nombre:38s} {parametros:40s} {cociente:6.2f}x{marca}")
+    print(f"{peores} casos más de un {100 * umbral:.0f}% más lentos")
+    return peores
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks sin pantalla del simulador de ondas.")
+    parser.add_argument("--salida", default="benchmarks.json", help="archivo JSON de resultados")
+    parser.add_argument("--base", help="resultados anteriores con los que comparar")
+    parser.add_argument("--filtro", help="sólo los casos cuyo nombre contenga este texto")
+    args = parser.parse_args(argv)
+
+    actual = ejecutar(args.filtro)
+    with open(args.salida, "w") as f:
+        json.dump(actual, f, indent=2)
+    print(f"\nResultados guardados en {args.salida}")
+    if args.base:
+        with open(args.base) as f:
+            comparar(actual, json.load(f))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+# Buffer circular de capacidad fija sobre un array numpy preasignado.
+
+import numpy as np
+
+
+class BufferCircular:
+    # Cada muestra se escribe dos veces (en i y en i + capacidad), de modo
+    # que las últimas `capacidad` muestras forman siempre un tramo contiguo
+    # del array y se pueden devolver como vista, sin copiar.
+    def __init__(self, capacidad, forma=(), dtype=float):
+        self.capacidad = int(capacidad)
+        self._datos = np.zeros((2 * self.capacidad,) + tuple(forma), dtype=dtype)
+        self._pos = 0
+        self.total = 0
+
+    def __len__(self):
+        return min(self.total, self.capacidad)
+
+    def limpiar(self):
+        self._pos = 0
+        self.total = 0
+
+    def agregar(self, valor):
+        self._datos[self._pos] = valor
+        self._datos[self._pos + self.capacidad] = valor
+        self._pos = (self._pos + 1) % self.capacidad
+        self.total += 1
+
+    def extender(self, valores):
+        cap = self.capacidad
+        m = len(valores)
+        self.total += m
+        if m > cap:
+            # Sólo sobreviven las últimas `cap` muestras
+            self._pos = (self._pos + m - cap) % cap
+            valores = valores[m - cap:]
+            m = cap
+        fin = self._pos + m
+        if fin <= cap:
+            self._datos[self._pos:fin] = valores
+            self._datos[self._pos + cap:fin + cap] = valores
+        else:
+            n1 = cap - self._pos
+            self._datos[self._pos:cap] = valores[:n1]
+            self._datos[self._pos + cap:] = valores[:n1]
+            self._datos[:m - n1] = valores[n1:]
+            self._datos[cap:cap + m - n1] = valores[n1:]
+        self._pos = fin % cap
+
+    def vista(self, n=None):
+        # Últimas n muestras en orden cronológico (vista, no copia)
+        if n is None or n > len(self):
+            n = len(self)
+        fin = self._pos + self.capacidad
+        return self._datos[fin - n:fin]
+
+
+class AnilloAudio:
+    # Buffer circular de un productor y un consumidor para audio float32.
+    # El hilo de audio escribe cada canal en su sitio y luego publica el
+    # bloque avanzando `escrito` (una sola asignación de entero). El lector
+    # copia una ventana a su propio buffer y comprueba después que el
+    # productor no la haya sobrescrito mientras copiaba; si fue así, repite.
+    # Como el productor escribe un bloque antes de publicarlo, la
+    # comprobación deja un margen del mayor bloque visto.
+    def __init__(self, capacidad, canales=1, dtype=np.float32):
+        self.capacidad = int(capacidad)
+        self.canales = canales
+        self._datos = np.zeros((canales, self.capacidad), dtype=dtype)
+        self._lectura = np.zeros((canales, self.capacidad), dtype=dtype)
+        self.escrito = 0
+        self.bloque_max = 0
+
+    # ---- lado productor (hilo de audio) ----
+    def escribir(self, canal, datos):
+        cap = self.capacidad
+        m = len(datos)
+        ini = self.escrito % cap
+        fin = ini + m
+        if fin <= cap:
+            self._datos[canal, ini:fin] = datos
+        else:
+            n1 = cap - ini
+            self._datos[canal, ini:] = datos[:n1]
+            self._datos[canal, :m - n1] = datos[n1:]
+
+    def publicar(self, muestras):
+        if muestras > self.bloque_max:
+            self.bloque_max = muestras
+        self.escrito += muestras
+
+    # ---- lado consumidor (interfaz) ----
+    def _copiar(self, ini, fin, out):
+        # Copia las muestras [ini, fin) a out y dice si el productor pudo
+        # sobrescribirlas mientras tanto
+        cap = self.capacidad
+        a = ini % cap
+        m = fin - ini
+        if a + m <= cap:
+            out[:] = self._datos[:, a:a + m]
+        else:
+            n1 = cap - a
+            out[:, :n1] = self._datos[:, a:]
+            out[:, n1:] = self._datos[:, :m - n1]
+        return self.escrito + self.bloque_max - ini <= cap
+
+    def leer(self, n, reintentos=3):
+        # Devuelve (canales, n) con las últimas n muestras publicadas. El
+        # resultado es una vista del buffer del lector, válida hasta la
+        # siguiente lectura.
+        n = min(int(n), self.capacidad)
+        out = self._lectura[:, :n]
+        for _ in range(reintentos):
+            fin = self.escrito
+            ini = max(0, fin - n)
+            out[:, :n - (fin - ini)] = 0
+            if self._copiar(ini, fin, out[:, n - (fin - ini):]):
+                break
+        return out
+
+    def leer_desde(self, inicio, reintentos=3):
+        # Muestras publicadas desde la posición absoluta `inicio`; si el
+        # lector se ha quedado atrás, sólo las que aún no se pueden
+        # sobrescribir. Devuelve (datos, fin), con datos una vista del
+        # buffer del lector y fin la posición desde la que seguir.
+        for _ in range(reintentos):
+            fin = self.escrito
+            ini = max(inicio, fin - self.capacidad + self.bloque_max, 0)
+            out = self._lectura[:, :fin - ini]
+            if self._copiar(ini, fin, out):
+                break
+        return out, fin
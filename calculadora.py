@@ -0,0 +1,188 @@
+# Relaciones entre f, λ, v, k y ω resueltas por columnas.
+#
+#   python calculadora.py medidas.csv resultado.csv
+#   python calculadora.py --barrido f 20 20000 1000000 --log --fijo v=343 tabla.npz
+#
+# Cada fila es un caso independiente; NaN (o un campo vacío en el CSV)
+# significa desconocido. Con dos datos independientes se completan los
+# demás, con operaciones enmascaradas sobre columnas enteras. Las filas en
+# las que los datos dados no cumplen las relaciones se marcan como
+# inconsistentes; las que no tienen datos suficientes, como indeterminadas.
+
+import argparse
+import io
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+CAMPOS = ("f", "lambda", "v", "k", "omega")
+ETIQUETAS = {
+    "f": "Frecuencia (f)",
+    "lambda": "Longitud de onda (λ)",
+    "v": "Velocidad (v)",
+    "k": "Número de onda (k)",
+    "omega": "Pulsación angular (ω)",
+}
+ALIAS = {"λ": "lambda", "ω": "omega", "w": "omega"}
+RTOL = 1e-6
+FILAS_POR_TROZO = 65536
+
+# Campo vacío: al principio de línea antes de una coma, entre dos comas o
+# tras la última coma
+_VACIO = re.compile(r"^(?=,)|(?<=,)(?=,|$)", re.M)
+
+
+def campo(nombre):
+    nombre = nombre.strip()
+    nombre = ALIAS.get(nombre, nombre)
+    if nombre not in CAMPOS:
+        raise ValueError(f"campo desconocido: {nombre!r} (usa {', '.join(CAMPOS)})")
+    return nombre
+
+
+def resolver(datos, rtol=RTOL):
+    # datos: {campo: array} con los campos que se conozcan. Devuelve un dict
+    # con los cinco campos completados donde se pueda, más las máscaras
+    # "inconsistente" e "indeterminado". Si una fila es inconsistente, los
+    # valores calculados siguen la prioridad f > ω > v/λ y λ > k > v/f.
+    datos = {campo(c): np.asarray(x, dtype=float) for c, x in datos.items()}
+    n = np.broadcast_shapes(*(x.shape for x in datos.values()))
+    dado = {c: np.broadcast_to(datos.get(c, np.nan), n) for c in CAMPOS}
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # f y λ de sus datos directos
+        f = dado["f"].copy()
+        lam = dado["lambda"].copy()
+        np.copyto(f, dado["omega"] / (2 * np.pi), where=np.isnan(f))
+        np.copyto(lam, 2 * np.pi / dado["k"], where=np.isnan(lam))
+        # y, si falta uno, del otro y de v
+        np.copyto(f, dado["v"] / lam, where=np.isnan(f))
+        np.copyto(lam, dado["v"] / f, where=np.isnan(lam))
+
+        indeterminado = ~(np.isfinite(f) & np.isfinite(lam))
+        calculado = {"f": f, "lambda": lam, "v": f * lam,
+                     "k": 2 * np.pi / lam, "omega": 2 * np.pi * f}
+
+        inconsistente = np.zeros(n, dtype=bool)
+        resultado = {}
+        for c in CAMPOS:
+            x, y = dado[c], calculado[c]
+            comparable = ~np.isnan(x) & np.isfinite(y)
+            inconsistente |= comparable & ~np.isclose(x, y, rtol=rtol, atol=0.0)
+            # Donde no se pudo calcular se conserva el dato
+            resultado[c] = np.where(np.isfinite(y), y, x)
+
+    resultado["inconsistente"] = inconsistente
+    resultado["indeterminado"] = indeterminado
+    return resultado
+
+
+def barrido(nombre, inicio, fin, n, log=False, **fijos):
+    # Tabla de entrada con un campo barrido entre inicio y fin y otros fijos
+    espacio = np.geomspace if log else np.linspace
+    datos = {campo(nombre): espacio(inicio, fin, n)}
+    for c, valor in fijos.items():
+        datos[campo(c)] = np.full(n, float(valor))
+    return datos
+
+
+# =======================
+# Lectura y escritura
+# =======================
+def leer(ruta):
+    # CSV con cabecera, .npz con un array por campo o .npy estructurado
+    ext = os.path.splitext(ruta)[1].lower()
+    if ext == ".npz":
+        with np.load(ruta) as z:
+            return {campo(c): z[c] for c in z.files}
+    if ext == ".npy":
+        a = np.load(ruta)
+        if a.dtype.names is None:
+            raise ValueError(f"{ruta}: el .npy debe ser un array estructurado con campos {', '.join(CAMPOS)}")
+        return {campo(c): a[c] for c in a.dtype.names}
+    with open(ruta) as f:
+        cabecera = [campo(c) for c in f.readline().split(",")]
+        texto = _VACIO.sub("nan", f.read())
+    datos = np.loadtxt(io.StringIO(texto), delimiter=",", ndmin=2)
+    return {c: datos[:, i] for i, c in enumerate(cabecera)}
+
+
+def escribir(ruta, resultado):
+    ext = os.path.splitext(ruta)[1].lower()
+    if ext == ".npz":
+        np.savez(ruta, **resultado)
+        return
+    columnas = np.column_stack([resultado[c] for c in CAMPOS]
+                               + [resultado["inconsistente"], resultado["indeterminado"]])
+    # Se formatea por trozos con un único % por trozo: el doble de rápido
+    # que np.savetxt, que formatea fila a fila
+    linea = ",".join(["%.10g"] * len(CAMPOS) + ["%d", "%d"]) + "\n"
+    with open(ruta, "w") as f:
+        f.write(",".join(CAMPOS + ("inconsistente", "indeterminado")) + "\n")
+        for ini in range(0, len(columnas), FILAS_POR_TROZO):
+            trozo = columnas[ini:ini + FILAS_POR_TROZO]
+            f.write((linea * len(trozo)) % tuple(trozo.ravel().tolist()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="calcular",
+        description="Completa f, λ, v, k y ω por filas (v = fλ, k = 2π/λ, ω = 2πf).")
+    parser.add_argument("entrada", nargs="?", help="CSV, .npz o .npy con columnas " + ", ".join(CAMPOS))
+    parser.add_argument("salida", help="CSV o .npz de resultados")
+    parser.add_argument("--barrido", nargs=4, metavar=("CAMPO", "INICIO", "FIN", "N"),
+                        help="en vez de un archivo de entrada, barre un campo")
+    parser.add_argument("--log", action="store_true", help="barrido logarítmico")
+    parser.add_argument("--fijo", action="append", default=[], metavar="CAMPO=VALOR",
+                        help="valor constante de otro campo en el barrido; se puede repetir")
+    parser.add_argument("--rtol", type=float, default=RTOL,
+                        help="tolerancia relativa para marcar filas inconsistentes")
+    args = parser.parse_args(argv)
+
+    if args.barrido:
+        if args.entrada:
+            parser.error("usa un archivo de entrada o --barrido, no los dos")
+        nombre, inicio, fin, n = args.barrido
+        fijos = {}
+        for texto in args.fijo:
+            c, igual, valor = texto.partition("=")
+            if not igual:
+                parser.error(f"--fijo espera CAMPO=VALOR, no {texto!r}")
+            try:
+                fijos[campo(c)] = float(valor)
+            except ValueError as e:
+                parser.error(f"--fijo {texto}: {e}")
+        try:
+            datos = barrido(nombre, float(inicio), float(fin), int(n), args.log, **fijos)
+        except ValueError as e:
+            parser.error(f"--barrido: {e}")
+    elif args.entrada:
+        if args.fijo:
+            parser.error("--fijo sólo se usa con --barrido")
+        datos = None
+    else:
+        parser.error("falta el archivo de entrada (o --barrido)")
+
+    try:
+        if datos is None:
+            datos = leer(args.entrada)
+        inicio = time.perf_counter()
+        resultado = resolver(datos, args.rtol)
+        segundos = time.perf_counter() - inicio
+        escribir(args.salida, resultado)
+    except (ValueError, OSError) as e:
+        # Archivo que no existe o no se puede leer, columna desconocida,
+        # valores no numéricos o columnas de distinta longitud
+        print(f"calcular: {e}", file=sys.stderr)
+        return 1
+    filas = len(resultado["f"])
+    print(f"{filas} filas en {segundos:.3f} s: {resultado['inconsistente'].sum()} inconsistentes,"
+          f" {resultado['indeterminado'].sum()} indeterminadas -> {args.salida}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+# Campo de interferencia en 2D de varias fuentes puntuales de la misma
+# frecuencia (el ruido primario y los altavoces de antirruido).
+#
+# Cada fuente s aporta el fasor U_s = A_s/sqrt(r_s) * exp(i(k*r_s + phi_s))
+# (onda cilíndrica). El campo en el instante t es
+# Re(U*exp(-iwt)) = Re(U)*cos(wt) + Im(U)*sin(wt), así que, calculados los
+# fasores, cada frame son dos productos por punto. Los fasores se guardan
+# por fuente (partes real e imaginaria en float32) y al mover una fuente
+# sólo se recalcula la suya. El cálculo va por teselas de filas para
+# acotar la memoria temporal, y se puede repartir en un pool de procesos.
+
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+Fuente = namedtuple("Fuente", "x y amplitud fase")
+
+# Filas por tesela: los temporales de una tesela de 1000 columnas ocupan
+# unos pocos MB
+FILAS_POR_TESELA = 128
+# Cerca de la fuente 1/sqrt(r) diverge; por debajo de r_min se satura
+R_MIN_POR_PUNTO = 1.0
+PISO_DB = -60.0
+
+
+def tesela(xs, ys, fuente, k, r_min, out=None):
+    # Fasor (2, filas, columnas) de una fuente sobre la tesela xs x ys
+    if out is None:
+        out = np.empty((2, len(ys), len(xs)), dtype=np.float32)
+    dx = xs - np.float32(fuente.x)
+    dy = (ys - np.float32(fuente.y))[:, None]
+    r = np.hypot(dx, dy)
+    np.maximum(r, np.float32(r_min), out=r)
+    amplitud = np.sqrt(r)
+    np.divide(np.float32(fuente.amplitud), amplitud, out=amplitud)
+    r *= np.float32(k)
+    r += np.float32(fuente.fase)
+    np.cos(r, out=out[0])
+    np.sin(r, out=out[1])
+    out *= amplitud
+    return out
+
+
+class Campo2D:
+    def __init__(self, xs, ys, k, procesos=None, filas=FILAS_POR_TESELA):
+        self.xs = np.asarray(xs, dtype=np.float32)
+        self.ys = np.asarray(ys, dtype=np.float32)
+        self.k = k
+        self.filas = filas
+        paso = min(abs(self.xs[1] - self.xs[0]), abs(self.ys[1] - self.ys[0]))
+        self.r_min = R_MIN_POR_PUNTO * float(paso)
+        self.forma = (len(self.ys), len(self.xs))
+        self.fuentes = []
+        self._fasores = []
+        self.total = np.zeros((2,) + self.forma, dtype=np.float32)
+        self._tmp = np.empty(self.forma, dtype=np.float32)
+        self.version = 0
+        self.procesos = procesos
+        self._pool = None
+
+    def cerrar(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    # ---- fuentes ----
+    def _calcular(self, fuente, out):
+        teselas = range(0, self.forma[0], self.filas)
+        if not self.procesos or self.procesos < 2:
+            for ini in teselas:
+                fin = ini + self.filas
+                tesela(self.xs, self.ys[ini:fin], fuente, self.k, self.r_min, out[:, ini:fin])
+            return out
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.procesos,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        futuros = [(ini, self._pool.submit(tesela, self.xs, self.ys[ini:ini + self.filas],
+                                           fuente, self.k, self.r_min))
+                   for ini in teselas]
+        for ini, futuro in futuros:
+            parte = futuro.result()
+            out[:, ini:ini + parte.shape[1]] = parte
+        return out
+
+    def agregar(self, fuente):
+        fasor = self._calcular(fuente, np.empty_like(self.total))
+        self.fuentes.append(fuente)
+        self._fasores.append(fasor)
+        self.total += fasor
+        self.version += 1
+        return len(self.fuentes) - 1
+
+    def cambiar(self, i, **cambios):
+        # Posición, amplitud o fase de la fuente i. Si no se mueve, el
+        # fasor nuevo es el anterior escalado y girado, sin recalcular.
+        anterior = self.fuentes[i]
+        fuente = anterior._replace(**cambios)
+        if fuente == anterior:
+            return
+        fasor = self._fasores[i]
+        self.total -= fasor
+        if (fuente.x, fuente.y) != (anterior.x, anterior.y) or anterior.amplitud == 0:
+            self._calcular(fuente, fasor)
+        else:
+            escala = fuente.amplitud / anterior.amplitud
+            giro = fuente.fase - anterior.fase
+            c, s = np.float32(escala * np.cos(giro)), np.float32(escala * np.sin(giro))
+            re = fasor[0] * c - fasor[1] * s
+            fasor[1] *= c
+            fasor[1] += fasor[0] * s
+            fasor[0] = re
+        self.fuentes[i] = fuente
+        self.total += fasor
+        self.version += 1
+
+    def set_k(self, k):
+        self.k = k
+        self.total[:] = 0
+        for fuente, fasor in zip(self.fuentes, self._fasores):
+            self._calcular(fuente, fasor)
+            self.total += fasor
+        self.version += 1
+
+    # ---- mapas ----
+    def instantaneo(self, wt, out=None):
+        # Campo en el instante t (wt = w*t)
+        if out is None:
+            out = np.empty(self.forma, dtype=np.float32)
+        np.multiply(self.total[0], np.float32(np.cos(wt)), out=out)
+        np.multiply(self.total[1], np.float32(np.sin(wt)), out=self._tmp)
+        out += self._tmp
+        return out
+
+    def intensidad(self, out=None, fasor=None):
+        # Intensidad media en el tiempo, |U|^2 / 2
+        fasor = self.total if fasor is None else fasor
+        if out is None:
+            out = np.empty(self.forma, dtype=np.float32)
+        np.multiply(fasor[0], fasor[0], out=out)
+        np.multiply(fasor[1], fasor[1], out=self._tmp)
+        out += self._tmp
+        out *= np.float32(0.5)
+        return out
+
+    def intensidad_db(self, out=None):
+        out = self.intensidad(out)
+        np.maximum(out, np.float32(10 ** (PISO_DB / 10)), out=out)
+        np.log10(out, out=out)
+        out *= np.float32(10)
+        return out
+
+    def atenuacion_db(self, out=None, referencia=0):
+        # Intensidad total respecto a la de la fuente `referencia` sola (el
+        # ruido primario): negativo donde el antirruido lo reduce
+        out = self.intensidad(out)
+        ref = self.intensidad(np.empty(self.forma, dtype=np.float32), self._fasores[referencia])
+        piso = np.float32(10 ** (PISO_DB / 10))
+        np.maximum(out, piso, out=out)
+        np.maximum(ref, piso, out=ref)
+        np.divide(out, ref, out=out)
+        np.log10(out, out=out)
+        out *= np.float32(10)
+        return out
@@ -0,0 +1,256 @@
+# Cancelación adaptativa por bloques (NLMS y FxLMS), sin Qt ni sounddevice.
+# Toda la memoria se reserva al crear los filtros; procesar un bloque sólo
+# escribe en esos arrays, así que se puede llamar desde el callback de audio.
+
+import sys
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Protecciones del control en vivo: fuga de los pesos (por unidad de mu y
+# bloque), norma máxima de los pesos y amplitud máxima de la salida (el
+# fondo de escala de la tarjeta)
+FUGA = 1e-3
+NORMA_MAX = 4.0
+LIMITE_SALIDA = 1.0
+
+
+# =======================
+# Historial de señal con ventanas como vista
+# =======================
+class LineaRetardo:
+    # Guarda las últimas muestras de una señal en un array lineal con sitio
+    # para varios bloques. Las ventanas de `longitud` muestras que acaban en
+    # cada muestra nueva (desplazadas `retardo` muestras hacia atrás) se
+    # obtienen como vista de sliding_window_view, sin copiar. Cuando el array
+    # se llena, el historial necesario se copia al principio.
+    def __init__(self, longitud, bloque, retardo=0, bloques=8):
+        self.longitud = longitud
+        self.retardo = retardo
+        self.historia = longitud - 1 + retardo
+        bloques = max(bloques, -(-self.historia // bloque) + 1)
+        self._buf = np.zeros(self.historia + bloque * bloques)
+        self._ventanas = sliding_window_view(self._buf, longitud)
+        self._pos = self.historia
+
+    def empujar(self, x):
+        m = len(x)
+        if self._pos + m > len(self._buf):
+            h = self.historia
+            self._buf[:h] = self._buf[self._pos - h:self._pos]
+            self._pos = h
+        self._buf[self._pos:self._pos + m] = x
+        ini = self._pos - self.historia
+        self._pos += m
+        return self._ventanas[ini:ini + m]
+
+    def ultimas(self, m):
+        return self._buf[self._pos - m:self._pos]
+
+
+class FiltroFIR:
+    def __init__(self, coeficientes, bloque, retardo=0):
+        # Las ventanas van de la muestra más antigua a la más nueva, así que
+        # se guardan los coeficientes invertidos: y = ventanas @ h
+        self.h = np.asarray(coeficientes, dtype=float)[::-1].copy()
+        self.linea = LineaRetardo(len(self.h), bloque, retardo)
+
+    def filtrar(self, x, out):
+        return np.matmul(self.linea.empujar(x), self.h, out=out)
+
+
+# =======================
+# Filtro adaptativo NLMS / FxLMS
+# =======================
+class FiltroAdaptativo:
+    # Sin ruta secundaria es NLMS por bloques. Con una estimación de la ruta
+    # secundaria (altavoz -> micrófono, como coeficientes FIR más un retardo
+    # en muestras) la referencia se filtra por ella antes de adaptar: FxLMS.
+    # El error se define como e = d + S*y, así que los pesos bajan por -g.
+    # Con fuga > 0 los pesos decaen un poco en cada bloque (leaky LMS); si
+    # dejan de ser finitos o su norma pasa de norma_max, se reinician.
+    def __init__(self, longitud, bloque, mu=0.5, eps=1e-8,
+                 ruta_secundaria=None, retardo_secundario=0, fuga=0.0, norma_max=None):
+        self.longitud = longitud
+        self.bloque = bloque
+        self.mu = mu
+        self.eps = eps
+        self.fuga = fuga
+        self.norma_max = norma_max
+        self.reinicios = 0
+        self.h = np.zeros(longitud)
+        self.ref = LineaRetardo(longitud, bloque)
+        if ruta_secundaria is None:
+            self.s_est = None
+            self.ref_filtrada = None
+        else:
+            self.s_est = FiltroFIR(ruta_secundaria, bloque, retardo_secundario)
+            self.ref_filtrada = LineaRetardo(longitud, bloque)
+        self._xf = np.zeros(bloque)
+        self._g = np.zeros(longitud)
+        self._ventanas_f = None
+
+    @property
+    def coeficientes(self):
+        return self.h[::-1]
+
+    def reiniciar(self):
+        self.h[:] = 0
+
+    def filtrar(self, x, out):
+        m = len(x)
+        ventanas = self.ref.empujar(x)
+        np.matmul(ventanas, self.h, out=out)
+        if self.s_est is None:
+            self._ventanas_f = ventanas
+        else:
+            xf = self.s_est.filtrar(x, out=self._xf[:m])
+            self._ventanas_f = self.ref_filtrada.empujar(xf)
+        return out
+
+    def adaptar(self, e):
+        # Gradiente del bloque: g = Xf^T e, normalizado por la energía de la
+        # referencia filtrada en el bloque (aprox. ||Xf||^2 = L * sum(xf^2))
+        ventanas = self._ventanas_f
+        np.matmul(e, ventanas, out=self._g)
+        xf = ventanas[:, -1]
+        energia = self.longitud * np.dot(xf, xf)
+        self._g *= self.mu / (self.eps + energia)
+        if self.fuga:
+            self.h *= 1 - self.mu * self.fuga
+        self.h -= self._g
+        # Pesos no finitos o por encima de la norma máxima: el filtro está
+        # divergiendo y se empieza de nuevo
+        norma = np.sqrt(np.dot(self.h, self.h))
+        if not np.isfinite(norma) or (self.norma_max is not None and norma > self.norma_max):
+            self.reiniciar()
+            self.reinicios += 1
+
+
+class ControlRealimentado:
+    # Control con un único micrófono (el de VisualAudio): la referencia se
+    # reconstruye restando al micrófono el aporte estimado del altavoz,
+    # x = e - S*y. Se supone que el retardo de la ruta secundaria es al menos
+    # un bloque, de modo que ese aporte sólo depende de salidas ya emitidas.
+    # Si el modelo de la ruta secundaria es malo el FxLMS puede divergir: los
+    # pesos tienen fuga y norma acotada, y un bloque de salida que pase de
+    # `limite` (o no sea finito) sale en silencio y reinicia el filtro.
+    def __init__(self, longitud, bloque, mu=0.1,
+                 ruta_secundaria=(1.0,), retardo_secundario=None,
+                 fuga=FUGA, norma_max=NORMA_MAX, limite=LIMITE_SALIDA):
+        if retardo_secundario is None:
+            retardo_secundario = bloque
+        self.filtro = FiltroAdaptativo(longitud, bloque, mu,
+                                       ruta_secundaria=ruta_secundaria,
+                                       retardo_secundario=retardo_secundario,
+                                       fuga=fuga, norma_max=norma_max)
+        self.limite = limite
+        self.modelo = FiltroFIR(ruta_secundaria, bloque, retardo_secundario)
+        self._ceros = np.zeros(bloque)
+        self._ys = np.zeros(bloque)
+        self._ref = np.zeros(bloque)
+
+    def _reconstruir(self, e):
+        m = len(e)
+        ys = self.modelo.filtrar(self._ceros[:m], out=self._ys[:m])
+        return np.subtract(e, ys, out=self._ref[:m])
+
+    def procesar(self, e, out):
+        ref = self._reconstruir(e)
+        self.filtro.filtrar(ref, out)
+        pico = max(out.max(), -out.min())
+        if pico <= self.limite:
+            self.filtro.adaptar(e)
+        else:
+            # Salida saturada o no finita (NaN no pasa la comparación): el
+            # filtro está divergiendo; este bloque sale en silencio
+            out[:] = 0
+            self.filtro.reiniciar()
+            self.filtro.reinicios += 1
+        # La salida de este bloque sustituye a los ceros provisionales
+        self.modelo.linea.ultimas(len(e))[:] = out
+        return out
+
+    def invertir(self, e, out):
+        # Inversión directa (-e) con la misma reconstrucción de la
+        # referencia, para que los dos modos se midan contra lo mismo
+        self._reconstruir(e)
+        np.negative(e, out=out)
+        np.clip(out, -self.limite, self.limite, out=out)
+        self.modelo.linea.ultimas(len(e))[:] = out
+        return out
+
+    def referencia(self, m):
+        # Referencia reconstruida del último bloque: lo que habría oído el
+        # micrófono sin el altavoz
+        return self._ref[:m]
+
+
+# =======================
+# Simulación sin tarjeta de sonido
+# =======================
+def simular(x, ruta_primaria, ruta_secundaria, longitud=64, bloque=1024, mu=0.5,
+            estimacion_secundaria=None, retardo_estimacion=0):
+    # Cancelación feedforward: d = P*x llega al micrófono, y = W*x sale por
+    # el altavoz y llega como S*y. Devuelve (d, e) muestra a muestra.
+    # Con estimacion_secundaria=None se usa la ruta secundaria real (FxLMS
+    # con modelo perfecto); con ruta_secundaria=(1,) queda NLMS.
+    if estimacion_secundaria is None:
+        estimacion_secundaria = ruta_secundaria
+    filtro = FiltroAdaptativo(longitud, bloque, mu, ruta_secundaria=estimacion_secundaria,
+                              retardo_secundario=retardo_estimacion)
+    primaria = FiltroFIR(ruta_primaria, bloque)
+    secundaria = FiltroFIR(ruta_secundaria, bloque)
+    n = len(x) - len(x) % bloque
+    d = np.zeros(n)
+    e = np.zeros(n)
+    y = np.zeros(bloque)
+    sy = np.zeros(bloque)
+    for i in range(0, n, bloque):
+        xb = x[i:i + bloque]
+        primaria.filtrar(xb, out=d[i:i + bloque])
+        filtro.filtrar(xb, out=y)
+        secundaria.filtrar(y, out=sy)
+        np.add(d[i:i + bloque], sy, out=e[i:i + bloque])
+        filtro.adaptar(e[i:i + bloque])
+    return d, e
+
+
+def atenuacion_db(d, e):
+    return 10 * np.log10(np.dot(d, d) / max(np.dot(e, e), 1e-30))
+
+
+def ruido_prueba(n, fs=44100, semilla=0):
+    # Ruido de banda baja más dos tonos, parecido al de un ventilador
+    rng = np.random.default_rng(semilla)
+    t = np.arange(n) / fs
+    ruido = np.convolve(rng.standard_normal(n), np.ones(16) / 16, mode="same")
+    return ruido + 0.5 * np.sin(2 * np.pi * 120 * t) + 0.3 * np.sin(2 * np.pi * 350 * t)
+
+
+def informe(longitudes=(16, 32, 64, 128, 256), bloque=1024, segundos=10, fs=44100):
+    # Atenuación en la segunda mitad de la señal y tiempo de CPU por bloque
+    x = ruido_prueba(segundos * fs, fs)
+    primaria = np.zeros(48); primaria[40:44] = [0.5, 0.3, 0.15, 0.05]
+    secundaria = np.zeros(12); secundaria[8:11] = [0.7, 0.2, 0.1]
+    filas = []
+    for longitud in longitudes:
+        inicio = time.process_time()
+        d, e = simular(x, primaria, secundaria, longitud, bloque)
+        cpu = time.process_time() - inicio
+        mitad = len(d) // 2
+        filas.append({
+            "longitud": longitud,
+            "atenuacion_db": atenuacion_db(d[mitad:], e[mitad:]),
+            "ms_por_bloque": 1000 * cpu / (len(d) // bloque),
+        })
+    return filas
+
+
+if __name__ == '__main__':
+    bloque = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    print(f"bloque = {bloque} muestras ({1000 * bloque / 44100:.1f} ms a 44.1 kHz)")
+    for fila in informe(bloque=bloque):
+        print(f"L = {fila['longitud']:4d}  atenuación = {fila['atenuacion_db']:6.1f} dB"
+              f"  CPU = {fila['ms_por_bloque']:.3f} ms/bloque")
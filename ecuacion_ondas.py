@@ -0,0 +1,138 @@
+# Ecuación de ondas 1D con amortiguamiento, u_tt + gamma*u_t = c^2 u_xx,
+# resuelta por diferencias finitas (leapfrog) sin Qt.
+#
+# El esquema sólo necesita el paso actual y el anterior: el siguiente se
+# escribe encima del anterior y se intercambian las referencias, así que
+# cada paso trabaja sobre dos buffers preasignados y uno auxiliar, sin
+# crear arrays. El paso de tiempo es fijo, COURANT*dx/c (estable si
+# c*dt/dx <= 1), y `avanzar` da tantos subpasos como quepan en el tiempo
+# pedido, guardando el resto para la siguiente llamada.
+
+import math
+
+import numpy as np
+
+CONTORNOS = ("fijo", "libre", "absorbente")
+COURANT = 0.9
+
+
+class SolverOndas1D:
+    def __init__(self, x, c, gamma=0.0, contorno="fijo", courant=COURANT):
+        if not (math.isfinite(c) and c > 0):
+            raise ValueError(f"la velocidad debe ser positiva y finita: {c}")
+        if not 0 < courant <= 1:
+            raise ValueError(f"número de Courant fuera de (0, 1]: {courant}")
+        self.x = np.asarray(x, dtype=float)
+        self.dx = float(self.x[1] - self.x[0])
+        self.c = c
+        self.dt = courant * self.dx / c
+        n = len(self.x)
+        self.u = np.zeros(n)
+        self._anterior = np.zeros(n)
+        self._tmp = np.empty(n)
+        self.set_contorno(contorno)
+        self.set_gamma(gamma)
+        self.t = 0.0
+        self._resto = 0.0
+
+    def set_contorno(self, contorno):
+        if contorno not in CONTORNOS:
+            raise ValueError(f"contorno desconocido: {contorno}")
+        self.contorno = contorno
+
+    def set_gamma(self, gamma):
+        # u_next = a*u + b*(u[i+1] + u[i-1]) - d*u_prev
+        self.gamma = gamma
+        c2 = (self.c * self.dt / self.dx) ** 2
+        g = 1 + gamma * self.dt / 2
+        self._a = (2 - 2 * c2) / g
+        self._b = c2 / g
+        self._d = (2 - g) / g
+        # Contorno absorbente de Mur de primer orden
+        cdt = self.c * self.dt
+        self._mur = (cdt - self.dx) / (cdt + self.dx)
+
+    def iniciar(self, u0, v0=None):
+        # Desplazamiento y velocidad iniciales; el paso anterior se obtiene
+        # por Taylor, u(-dt) = u - dt*u_t + dt^2/2 * u_tt
+        u, anterior = self.u, self._anterior
+        u[:] = u0
+        if self.contorno == "fijo":
+            u[0] = u[-1] = 0
+        v = np.zeros_like(u) if v0 is None else np.broadcast_to(v0, u.shape)
+        lap = np.zeros_like(u)
+        lap[1:-1] = u[2:] - 2 * u[1:-1] + u[:-2]
+        if self.contorno == "libre":
+            lap[0] = 2 * (u[1] - u[0])
+            lap[-1] = 2 * (u[-2] - u[-1])
+        u_tt = (self.c / self.dx) ** 2 * lap - self.gamma * v
+        anterior[:] = u - self.dt * v + self.dt ** 2 / 2 * u_tt
+        self.t = 0.0
+        self._resto = 0.0
+
+    def paso(self):
+        u, nuevo, tmp = self.u, self._anterior, self._tmp
+        nuevo *= -self._d
+        np.add(u[2:], u[:-2], out=tmp[1:-1])
+        tmp[1:-1] *= self._b
+        nuevo[1:-1] += tmp[1:-1]
+        np.multiply(u, self._a, out=tmp)
+        nuevo += tmp
+        if self.contorno == "fijo":
+            nuevo[0] = nuevo[-1] = 0
+        elif self.contorno == "libre":
+            # Punto fantasma simétrico: u[-1] = u[1]
+            nuevo[0] += 2 * self._b * u[1]
+            nuevo[-1] += 2 * self._b * u[-2]
+        else:
+            nuevo[0] = u[1] + self._mur * (nuevo[1] - u[0])
+            nuevo[-1] = u[-2] + self._mur * (nuevo[-2] - u[-1])
+        self._anterior, self.u = u, nuevo
+        self.t += self.dt
+
+    def avanzar(self, segundos, max_pasos=None):
+        # Da los subpasos que quepan en `segundos` más el resto de la
+        # llamada anterior. Con max_pasos, el tiempo que no quepa se
+        # descarta (la simulación va más lenta en vez de acumular retraso).
+        # Devuelve el número de pasos dados.
+        self._resto += segundos
+        n = int(self._resto // self.dt)
+        if max_pasos is not None and n > max_pasos:
+            n = max_pasos
+            self._resto = 0.0
+        else:
+            self._resto -= n * self.dt
+        for _ in range(n):
+            self.paso()
+        return n
+
+    def energia(self):
+        # Energía por unidad de densidad, 1/2 * sum(u_t^2 + c^2 u_x^2) dx,
+        # con u_t y u_x centradas entre los dos pasos guardados
+        u_t = (self.u - self._anterior) / self.dt
+        u_x = np.diff(self.u + self._anterior) / (2 * self.dx)
+        return 0.5 * self.dx * (np.dot(u_t, u_t) + self.c ** 2 * np.dot(u_x, u_x))
+
+
+# =======================
+# Condiciones iniciales y solución exacta
+# =======================
+def pulso(x, centro, ancho, amplitud=1.0):
+    return amplitud * np.exp(-((x - centro) / ancho) ** 2)
+
+
+def modo_propio(x, n, contorno="fijo"):
+    # Modo n de la cuerda con extremos fijos (seno) o libres (coseno) y su
+    # número de onda; con contorno absorbente no hay modos, se usa el seno
+    longitud = x[-1] - x[0]
+    k = n * np.pi / longitud
+    forma = np.cos if contorno == "libre" else np.sin
+    return forma(k * (x - x[0])), k
+
+
+def solucion_modo(x, t, n, c, contorno="fijo", gamma=0.0):
+    # Solución exacta partiendo del modo n en reposo (subamortiguada)
+    forma, k = modo_propio(x, n, contorno)
+    w = math.sqrt((c * k) ** 2 - gamma ** 2 / 4)
+    amplitud = math.exp(-gamma * t / 2) * (math.cos(w * t) + gamma / (2 * w) * math.sin(w * t))
+    return amplitud * forma
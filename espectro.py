@@ -0,0 +1,78 @@
+# Espectro y espectrograma por STFT, calculados desde la interfaz con las
+# muestras que el hilo de audio ya ha publicado (nunca dentro del callback).
+# Las ventanas solapadas se toman como vistas de las muestras pendientes y
+# se transforman de LOTE en LOTE con un único rfft por lote.
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from buffer_circular import BufferCircular
+
+N_FFT = 2048
+SALTO = 512
+COLUMNAS = 256
+PISO_DB = -120.0
+# Saltos transformados por llamada a rfft
+LOTE = 32
+
+
+class Espectrograma:
+    def __init__(self, fs, canales=1, n_fft=N_FFT, salto=SALTO, columnas=COLUMNAS):
+        self.fs = fs
+        self.canales = canales
+        self.n_fft = n_fft
+        self.salto = salto
+        self.bins = n_fft // 2 + 1
+        self.frecuencias = np.fft.rfftfreq(n_fft, 1 / fs)
+        self.ventana = np.hanning(n_fft).astype(np.float32)
+        # Con esta escala un seno de amplitud 1 da 0 dB
+        self._escala = np.float32(2 / self.ventana.sum())
+        self._marcos = np.empty((canales, LOTE, n_fft), dtype=np.float32)
+        self._modulo = np.empty((canales, LOTE, self.bins), dtype=np.float32)
+        # Columnas en dB por canal, la más reciente al final
+        self.historia = [BufferCircular(columnas, (self.bins,), np.float32)
+                         for _ in range(canales)]
+        # Muestras que aún no completan una ventana
+        self._cola = np.zeros((canales, 0), dtype=np.float32)
+        self.reiniciar()
+
+    def reiniciar(self):
+        for h in self.historia:
+            h.limpiar()
+            h.extender(np.full((h.capacidad, self.bins), PISO_DB, dtype=np.float32))
+        self._cola = self._cola[:, :0]
+
+    def segundos(self):
+        # Tiempo que abarca el espectrograma
+        return self.historia[0].capacidad * self.salto / self.fs
+
+    def agregar(self, x):
+        # x: (canales, n) muestras nuevas en orden. Devuelve cuántas
+        # columnas se han añadido.
+        x = np.concatenate([self._cola, x], axis=1)
+        saltos = (x.shape[1] - self.n_fft) // self.salto + 1
+        if saltos <= 0:
+            self._cola = x
+            return 0
+        ventanas = sliding_window_view(x, self.n_fft, axis=-1)[:, ::self.salto]
+        for ini in range(0, saltos, LOTE):
+            m = min(LOTE, saltos - ini)
+            marcos = np.multiply(ventanas[:, ini:ini + m], self.ventana, out=self._marcos[:, :m])
+            modulo = self._modulo[:, :m]
+            np.abs(np.fft.rfft(marcos, axis=-1), out=modulo)
+            modulo *= self._escala
+            np.maximum(modulo, 10 ** (PISO_DB / 20), out=modulo)
+            np.log10(modulo, out=modulo)
+            modulo *= 20
+            for canal in range(self.canales):
+                self.historia[canal].extender(modulo[canal])
+        self._cola = x[:, saltos * self.salto:]
+        return saltos
+
+    def imagen(self, canal):
+        # (columnas, bins) en dB; vista sin copia
+        return self.historia[canal].vista()
+
+    def espectro(self, canal):
+        # Última columna en dB
+        return self.historia[canal].vista(1)[0]
@@ -0,0 +1,335 @@
+# Exportación de animaciones del simulador sin pantalla.
+#
+#   python exportar.py clase.mp4 --modo super --segundos 60 --fps 60
+#   python exportar.py frames.png --modo est -p E0=1 -p w=3
+#   python exportar.py datos.npz --modo fourier -p serie=cuadrada
+#
+# Los datos se calculan por lotes con MotorOndas y cada frame se dibuja con
+# Agg restaurando un fondo fijo (sólo se pintan las curvas y el rótulo). Los
+# lotes se reparten en un pool de procesos y se escriben en orden según
+# terminan: secuencia PNG, GIF, MP4 (con el ffmpeg del sistema) o NPZ con
+# los arrays, que no necesita dibujar nada.
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from motor_ondas import MODOS, MotorOndas, serie_fourier
+from parametros import PARAMETROS_INICIALES, interpretar, validar
+from resolucion import k_max_modo, tamano_malla
+
+FORMATOS = ("png", "gif", "mp4", "npz")
+# Misma escala de tiempo y dominio que SimuladorOndas
+VELOCIDAD = 10 / 3
+LONGITUD = 4 * np.pi
+PX = 2 * np.pi
+# Frames por tarea del pool
+LOTE = 32
+
+Exportacion = namedtuple("Exportacion", "modo valores fps ancho alto ruta formato")
+
+
+def formato_de(ruta):
+    formato = os.path.splitext(ruta)[1].lower().lstrip(".")
+    if formato not in FORMATOS:
+        raise ValueError(f"{ruta}: formato no soportado (usa .{', .'.join(FORMATOS)})")
+    return formato
+
+
+def ruta_frame(ruta, i):
+    # frames.png -> frames_00000.png, frames_00001.png, ...
+    base, ext = os.path.splitext(ruta)
+    return f"{base}_{i:05d}{ext}"
+
+
+def malla(modo, valores, ancho):
+    n = tamano_malla(ancho, k_max_modo(modo, valores), LONGITUD)
+    return np.linspace(0, LONGITUD, n)
+
+
+def limite(modo, p):
+    # Semiamplitud del eje y que contiene la onda en todo momento
+    if modo == "super":
+        return abs(p.E0) + abs(p.E1)
+    if modo == "est":
+        return 2 * abs(p.E0)
+    if modo == "fourier":
+        return np.abs(serie_fourier(p.serie, p.n_armonicos, p.E0, p.k, p.w).E0).sum()
+    return abs(p.E0)
+
+
+def tiempos(i0, n, fps):
+    return (i0 + np.arange(n)) * (VELOCIDAD / fps)
+
+
+# =======================
+# Dibujo con Agg
+# =======================
+class RenderAgg:
+    def __init__(self, modo, x, lim, ancho, alto, dpi=100):
+        self.modo = modo
+        self.x = x
+        self.fig = Figure(figsize=(ancho / dpi, alto / dpi), dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.fig)
+        lim = 1.1 * lim
+        if modo == "super":
+            ejes = [self.fig.add_subplot(311 + i) for i in range(3)]
+            estilos = [("b", "Onda 1"), ("r", "Onda 2"), ("g", "Suma")]
+        else:
+            ejes = [self.fig.add_subplot(111)]
+            estilos = [({"simple": "b", "est": "g", "fourier": "m"}[modo], None)]
+        self.lineas = []
+        for ax, (color, etiqueta) in zip(ejes, estilos):
+            ax.set_xlim(0, LONGITUD)
+            ax.set_ylim(-lim, lim)
+            ax.grid(True)
+            linea, = ax.plot([], [], color, label=etiqueta, animated=True)
+            if etiqueta:
+                ax.legend(loc="upper right")
+            self.lineas.append(linea)
+        ejes[-1].set_xlabel("x (posición)")
+        self.particula = None
+        if modo == "est":
+            self.particula, = ejes[0].plot([], [], "ro", markersize=8, animated=True)
+        self.rotulo = ejes[0].text(0.01, 0.9, "", transform=ejes[0].transAxes, animated=True)
+        self.fig.tight_layout()
+        self.canvas.draw()
+        self.fondo = self.canvas.copy_from_bbox(self.fig.bbox)
+
+    def frame(self, t, ys):
+        # Devuelve una vista (alto, ancho, 4) RGBA del buffer de Agg, válida
+        # hasta el siguiente frame
+        self.canvas.restore_region(self.fondo)
+        if self.modo == "est":
+            y, y_particula = ys
+            self.particula.set_data([PX], [y_particula])
+            ys = (y,)
+        for linea, y in zip(self.lineas, ys):
+            linea.set_data(self.x, y)
+            self.fig.draw_artist(linea)
+        if self.particula is not None:
+            self.fig.draw_artist(self.particula)
+        self.rotulo.set_text(f"t = {t:.2f}")
+        self.fig.draw_artist(self.rotulo)
+        return np.asarray(self.canvas.buffer_rgba())
+
+
+# =======================
+# Procesos del pool
+# =======================
+_TRABAJO = None
+
+
+def paleta_gif():
+    # Paleta web fija, igual en todos los procesos; la figura usa pocos
+    # colores y cuantizar contra una paleta dada es mucho más rápido que
+    # calcular una por frame
+    from PIL import Image
+    return Image.new("RGB", (1, 1)).convert("P", palette=Image.Palette.WEB)
+
+
+def _iniciar(exp):
+    global _TRABAJO
+    x = malla(exp.modo, exp.valores, exp.ancho)
+    motor = MotorOndas(x)
+    render = RenderAgg(exp.modo, x, limite(exp.modo, exp.valores), exp.ancho, exp.alto)
+    paleta = paleta_gif() if exp.formato == "gif" else None
+    _TRABAJO = exp, motor, render, paleta
+
+
+def _renderizar(i0, n):
+    # Calcula y dibuja los frames [i0, i0 + n). Los PNG se escriben aquí;
+    # para GIF y MP4 se devuelven los frames ya codificados en bytes.
+    from PIL import Image
+    exp, motor, render, paleta = _TRABAJO
+    t = tiempos(i0, n, exp.fps)
+    datos = motor.bloque_modo(exp.modo, exp.valores, t, PX)
+    salida = []
+    for j in range(n):
+        rgba = render.frame(t[j], [d[j] for d in datos])
+        if exp.formato == "png":
+            imagen = Image.fromarray(rgba).convert("RGB")
+            imagen.save(ruta_frame(exp.ruta, i0 + j), compress_level=1)
+        elif exp.formato == "gif":
+            imagen = Image.fromarray(rgba).convert("RGB")
+            salida.append(imagen.quantize(palette=paleta, dither=Image.Dither.NONE).tobytes())
+        else:
+            # ffmpeg acepta RGBA tal cual sale de Agg
+            salida.append(rgba.tobytes())
+    return salida
+
+
+# =======================
+# Exportación
+# =======================
+def _exportar_npz(exp, n, lote):
+    x = malla(exp.modo, exp.valores, exp.ancho)
+    motor = MotorOndas(x)
+    t = tiempos(0, n, exp.fps)
+    datos = None
+    for i0 in range(0, n, lote):
+        bloque = motor.bloque_modo(exp.modo, exp.valores, t[i0:i0 + lote], PX)
+        if datos is None:
+            datos = [np.empty((n,) + d.shape[1:], dtype=np.float32) for d in bloque]
+        for destino, d in zip(datos, bloque):
+            destino[i0:i0 + len(d)] = d
+    nombres = {"simple": ("y",), "super": ("y1", "y2", "suma"),
+               "est": ("y", "y_particula"), "fourier": ("y",)}[exp.modo]
+    np.savez(exp.ruta, x=x, t=t, modo=exp.modo,
+             parametros=np.array([str(v) for v in exp.valores]),
+             campos=np.array(exp.valores._fields), **dict(zip(nombres, datos)))
+
+
+def _lotes(exp, n, procesos):
+    # Frames de cada lote, en orden
+    if procesos == 1:
+        # Con un solo proceso el pool sólo añadiría copias entre procesos
+        _iniciar(exp)
+        for i0 in range(0, n, LOTE):
+            yield _renderizar(i0, min(LOTE, n - i0))
+        return
+    # spawn: los procesos no heredan el estado de Qt si se exporta desde la
+    # interfaz
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(procesos, mp_context=contexto, initializer=_iniciar,
+                             initargs=(exp,)) as pool:
+        pendientes = deque()
+        lotes = iter(range(0, n, LOTE))
+        while True:
+            # Como mucho dos lotes en vuelo por proceso
+            for i0 in lotes:
+                pendientes.append(pool.submit(_renderizar, i0, min(LOTE, n - i0)))
+                if len(pendientes) >= 2 * procesos:
+                    break
+            if not pendientes:
+                return
+            yield pendientes.popleft().result()
+
+
+def _abrir_ffmpeg(exp):
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise RuntimeError("no se encontró ffmpeg; exporta a .gif, .png o .npz")
+    return subprocess.Popen(
+        [ffmpeg, "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgba",
+         "-s", f"{exp.ancho}x{exp.alto}", "-r", str(exp.fps), "-i", "-",
+         "-c:v", "libx264", "-pix_fmt", "yuv420p", "-crf", "18", exp.ruta],
+        stdin=subprocess.PIPE)
+
+
+def exportar(ruta, modo="super", valores=PARAMETROS_INICIALES, segundos=10.0, fps=60,
+             ancho=800, alto=450, procesos=None):
+    if modo not in MODOS:
+        raise ValueError(f"modo desconocido: {modo}")
+    formato = formato_de(ruta)
+    # yuv420p necesita dimensiones pares
+    exp = Exportacion(modo, valores, fps, ancho - ancho % 2, alto - alto % 2, ruta, formato)
+    n = max(1, round(segundos * fps))
+    inicio = time.perf_counter()
+
+    if formato == "npz":
+        _exportar_npz(exp, n, LOTE)
+        segundos_reales = time.perf_counter() - inicio
+        return {"frames": n, "tiempo_s": segundos_reales, "fps": n / segundos_reales}
+
+    if formato == "png" and os.path.dirname(ruta):
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    ffmpeg = _abrir_ffmpeg(exp) if formato == "mp4" else None
+    gif = EscritorGif(exp) if formato == "gif" else None
+    try:
+        for frames in _lotes(exp, n, procesos or os.cpu_count() or 1):
+            for frame in frames:
+                if ffmpeg is not None:
+                    ffmpeg.stdin.write(frame)
+                elif gif is not None:
+                    gif.escribir(frame)
+    finally:
+        if ffmpeg is not None:
+            ffmpeg.stdin.close()
+            ffmpeg.wait()
+        if gif is not None:
+            gif.cerrar()
+
+    segundos_reales = time.perf_counter() - inicio
+    return {"frames": n, "tiempo_s": segundos_reales, "fps": n / segundos_reales}
+
+
+class EscritorGif:
+    # GIF escrito frame a frame según llegan los lotes: la cabecera (paleta
+    # global y bucle) con el primero, y cada frame comprimido por Pillow.
+    # Image.save(save_all=True) guardaría todos los frames hasta el final.
+    # GIF guarda la duración en centésimas: más de 50 fps no se respeta.
+    def __init__(self, exp):
+        self.tam = (exp.ancho, exp.alto)
+        self.duracion = round(1000 / exp.fps)
+        self.paleta = paleta_gif().getpalette()
+        self.frames = 0
+        self._f = open(exp.ruta, "wb")
+
+    def escribir(self, datos):
+        from PIL import GifImagePlugin, Image
+        imagen = Image.frombytes("P", self.tam, datos)
+        imagen.putpalette(self.paleta)
+        if self.frames == 0:
+            cabecera, _ = GifImagePlugin.getheader(imagen, None, {"loop": 0, "optimize": False})
+            for trozo in cabecera:
+                self._f.write(trozo)
+        for trozo in GifImagePlugin.getdata(imagen, duration=self.duracion):
+            self._f.write(trozo)
+        self.frames += 1
+
+    def cerrar(self):
+        self._f.write(b";")
+        self._f.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="exportar",
+        description="Exporta una animación del simulador sin pantalla "
+                    "(secuencia PNG, GIF, MP4 o NPZ según la extensión).")
+    parser.add_argument("salida", help="archivo de salida: .png, .gif, .mp4 o .npz")
+    parser.add_argument("--modo", choices=MODOS, default="super")
+    parser.add_argument("--segundos", type=float, default=10.0)
+    parser.add_argument("--fps", type=float, default=60)
+    parser.add_argument("--ancho", type=int, default=800, help="píxeles")
+    parser.add_argument("--alto", type=int, default=450, help="píxeles")
+    parser.add_argument("--procesos", type=int, help="por defecto, uno por CPU")
+    parser.add_argument("-p", "--parametro", action="append", default=[], metavar="NOMBRE=VALOR",
+                        help="como en la interfaz (k y k1 en múltiplos de pi); se puede repetir")
+    args = parser.parse_args(argv)
+
+    cambios = {}
+    for texto in args.parametro:
+        nombre, _, valor = texto.partition("=")
+        if nombre not in PARAMETROS_INICIALES._fields:
+            parser.error(f"parámetro desconocido: {nombre}")
+        try:
+            cambios[nombre] = validar(nombre, interpretar(nombre, valor))
+        except ValueError as e:
+            parser.error(f"{nombre}: {e}")
+    valores = PARAMETROS_INICIALES._replace(**cambios)
+
+    try:
+        r = exportar(args.salida, args.modo, valores, args.segundos, args.fps,
+                     args.ancho, args.alto, args.procesos)
+    except (ValueError, RuntimeError, OSError) as e:
+        # Extensión no soportada, ffmpeg ausente o error al escribir
+        print(f"exportar: {e}", file=sys.stderr)
+        return 1
+    print(f"{r['frames']} frames en {r['tiempo_s']:.2f} s -> {args.salida}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,236 @@
+# Grabación de sesiones del stream de audio sin bloquear el callback.
+#
+# El callback copia cada bloque (entrada, antirruido, residual) a una cola
+# circular preasignada de un productor y un consumidor, igual que
+# AnilloAudio: escribe las muestras y después publica avanzando `escrito`.
+# Un hilo escritor la vacía a disco en trozos grandes y secuenciales, como
+# WAV float32 de varios canales o como float32 crudo entrelazado. El
+# callback no toma locks, no crea arrays y no toca el disco: si la cola
+# está llena descarta el bloque entero y lo cuenta. Cada racha de bloques
+# perdidos se anota en una segunda cola de tamaño fijo y el escritor la
+# rellena con ceros, así que el archivo conserva la escala de tiempo del
+# stream. La memoria es la de las colas, fija desde el principio.
+#
+# Junto al audio se guarda ruta + ".json" con el formato, los canales y
+# los contadores. Un WAV admite unos 4 GB (unas dos horas de tres canales a
+# 48 kHz); para sesiones más largas está el formato crudo.
+
+import json
+import threading
+
+import numpy as np
+
+from audio_offline import EscritorWav
+
+FORMATOS = ("wav", "f32")
+CANALES = ("entrada", "antirruido", "residual")
+# Segundos de audio que caben en la cola y que el escritor junta antes de
+# escribir
+SEGUNDOS_COLA = 10.0
+SEGUNDOS_TROZO = 1.0
+# Cada cuánto mira el escritor la cola (s)
+PERIODO = 0.05
+# Rachas de bloques perdidos que se pueden anotar antes de que el escritor
+# las lea
+MAX_HUECOS = 1024
+# Frames de ceros escritos de una vez al rellenar un hueco
+FRAMES_CEROS = 8192
+
+
+class EscritorCrudo:
+    # float32 entrelazado sin cabecera; fs y canales van en el JSON
+    def __init__(self, ruta, fs, canales):
+        self.fs = fs
+        self.canales = canales
+        self.frames = 0
+        self._f = open(ruta, "wb")
+
+    def escribir(self, bloque):
+        bloque = np.ascontiguousarray(bloque, dtype="<f4")
+        self._f.write(memoryview(bloque).cast("B"))
+        self.frames += len(bloque)
+
+    def cerrar(self):
+        self._f.close()
+
+
+class GrabadoraSesion:
+    def __init__(self, ruta, fs, canales=CANALES, formato="wav",
+                 segundos_cola=SEGUNDOS_COLA, segundos_trozo=SEGUNDOS_TROZO):
+        if formato not in FORMATOS:
+            raise ValueError(f"formato desconocido: {formato}")
+        self.ruta = ruta
+        self.fs = fs
+        self.canales = tuple(canales)
+        self.formato = formato
+        self.capacidad = int(segundos_cola * fs)
+        self.trozo = max(1, min(int(segundos_trozo * fs), self.capacidad))
+        # (frames, canales): cada tramo de la cola se escribe tal cual
+        self._cola = np.zeros((self.capacidad, len(self.canales)), dtype=np.float32)
+        # (posición en la cola, muestras perdidas) de cada racha
+        self._huecos = np.zeros((MAX_HUECOS, 2), dtype=np.int64)
+        self._ceros = np.zeros((FRAMES_CEROS, len(self.canales)), dtype=np.float32)
+
+        # Del productor (hilo de audio)
+        self.escrito = 0
+        self.huecos_escritos = 0
+        self.bloques = 0
+        self.bloques_perdidos = 0
+        self.muestras_perdidas = 0
+        self.huecos_sin_marcar = 0
+        self.ocupacion_max = 0
+        self._perdidas = 0
+        # Del consumidor (hilo escritor)
+        self.leido = 0
+        self.huecos_leidos = 0
+        self.frames = 0
+        self.error = None
+
+        self.grabando = False
+        self._escritor = None
+        self._parar = threading.Event()
+        self._hilo = None
+
+    @property
+    def memoria(self):
+        # Bytes reservados; no crecen durante la grabación
+        return self._cola.nbytes + self._huecos.nbytes + self._ceros.nbytes
+
+    # ---- desde la interfaz ----
+    def iniciar(self):
+        # Abre el archivo aquí para que un error de ruta salga al momento
+        clase = EscritorWav if self.formato == "wav" else EscritorCrudo
+        self._escritor = clase(self.ruta, self.fs, len(self.canales))
+        self._parar.clear()
+        self.grabando = True
+        self._hilo = threading.Thread(target=self._ejecutar, daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        # Deja de aceptar bloques, escribe lo que quede en la cola, cierra
+        # el archivo y guarda los metadatos
+        self.grabando = False
+        if self._hilo is None:
+            return self.estadisticas()
+        self._parar.set()
+        self._hilo.join()
+        self._hilo = None
+        with open(self.ruta + ".json", "w") as f:
+            json.dump(self.estadisticas(), f, indent=2)
+        return self.estadisticas()
+
+    # ---- desde el callback ----
+    def agregar(self, *bloques):
+        # Un array 1D por canal, todos de la misma longitud. Devuelve si el
+        # bloque entró en la cola.
+        if not self.grabando:
+            return False
+        m = len(bloques[0])
+        self.bloques += 1
+        ocupado = self.escrito - self.leido
+        if ocupado + m > self.capacidad:
+            self.bloques_perdidos += 1
+            self.muestras_perdidas += m
+            self._perdidas += m
+            return False
+        if self._perdidas:
+            # El hueco va antes del bloque que se publica ahora
+            if self.huecos_escritos - self.huecos_leidos < MAX_HUECOS:
+                hueco = self._huecos[self.huecos_escritos % MAX_HUECOS]
+                hueco[0] = self.escrito
+                hueco[1] = self._perdidas
+                self.huecos_escritos += 1
+            else:
+                self.huecos_sin_marcar += 1
+            self._perdidas = 0
+
+        cap = self.capacidad
+        ini = self.escrito % cap
+        fin = ini + m
+        canal = 0
+        for datos in bloques:
+            if fin <= cap:
+                self._cola[ini:fin, canal] = datos
+            else:
+                n1 = cap - ini
+                self._cola[ini:, canal] = datos[:n1]
+                self._cola[:m - n1, canal] = datos[n1:]
+            canal += 1
+        if ocupado + m > self.ocupacion_max:
+            self.ocupacion_max = ocupado + m
+        self.escrito += m
+        return True
+
+    # ---- hilo escritor ----
+    def _ejecutar(self):
+        try:
+            while not self._parar.wait(PERIODO):
+                if self.escrito - self.leido >= self.trozo:
+                    self._vaciar()
+            self._vaciar()
+            # Bloques perdidos al final, sin otro bloque detrás que los anote
+            self._escribir_ceros(self._perdidas)
+        except OSError as e:
+            # Disco lleno o similar: el callback deja de copiar
+            self.error = e
+            self.grabando = False
+        finally:
+            self._escritor.cerrar()
+
+    def _vaciar(self):
+        fin = self.escrito
+        while True:
+            hasta, hueco = fin, 0
+            if self.huecos_leidos < self.huecos_escritos:
+                pos, n = self._huecos[self.huecos_leidos % MAX_HUECOS]
+                if pos <= fin:
+                    hasta, hueco = int(pos), int(n)
+            self._escribir_cola(hasta)
+            if not hueco:
+                return
+            self._escribir_ceros(hueco)
+            self.huecos_leidos += 1
+
+    def _escribir_cola(self, hasta):
+        # Como mucho dos escrituras contiguas; la cola se libera después
+        cap = self.capacidad
+        while self.leido < hasta:
+            ini = self.leido % cap
+            n = min(hasta - self.leido, cap - ini)
+            self._escritor.escribir(self._cola[ini:ini + n])
+            self.frames += n
+            self.leido += n
+
+    def _escribir_ceros(self, n):
+        while n > 0:
+            m = min(n, FRAMES_CEROS)
+            self._escritor.escribir(self._ceros[:m])
+            self.frames += m
+            n -= m
+
+    def estadisticas(self):
+        return {
+            "ruta": self.ruta,
+            "formato": self.formato,
+            "fs": self.fs,
+            "canales": list(self.canales),
+            "frames": self.frames,
+            "segundos": self.frames / self.fs,
+            "bloques": self.bloques,
+            "bloques_perdidos": self.bloques_perdidos,
+            "muestras_perdidas": self.muestras_perdidas,
+            "huecos_sin_marcar": self.huecos_sin_marcar,
+            "ocupacion": (self.escrito - self.leido) / self.capacidad,
+            "ocupacion_max": self.ocupacion_max / self.capacidad,
+            "memoria_bytes": self.memoria,
+            "error": None if self.error is None else str(self.error),
+        }
+
+    def resumen(self):
+        s = self.estadisticas()
+        estado = "Grabando" if self.grabando else "Grabado"
+        texto = (f"{estado} {s['segundos']:.1f} s  |  cola {100 * s['ocupacion']:.0f} %"
+                 f" (máx {100 * s['ocupacion_max']:.0f} %)  |  bloques perdidos {s['bloques_perdidos']}")
+        if s["error"]:
+            texto += f"  |  error: {s['error']}"
+        return texto
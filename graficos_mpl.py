@@ -0,0 +1,140 @@
+# Gráficos Matplotlib del simulador. Están en un módulo aparte para que
+# matplotlib sólo se importe al abrir la pestaña del simulador.
+
+import numpy as np
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.figure import Figure
+
+from buffer_circular import BufferCircular
+from resolucion import DecimadorMinMax
+
+
+# =======================
+# Blitting para los gráficos Matplotlib
+# =======================
+class BlitCanvas(FigureCanvas):
+    # Guarda el fondo estático (ejes, rejillas, leyendas) tras cada dibujo
+    # completo y en cada tick sólo repinta los artistas animados. El dibujo
+    # completo se repite al redimensionar o al cambiar los límites.
+    def __init__(self, fig, blit=True):
+        super().__init__(fig)
+        self.blit_activo = blit
+        self.artistas = []
+        self._fondo = None
+        self.mpl_connect("draw_event", self._guardar_fondo)
+
+    def animar(self, *artistas):
+        for artista in artistas:
+            artista.set_animated(self.blit_activo)
+        self.artistas.extend(artistas)
+
+    def _guardar_fondo(self, event):
+        if not self.blit_activo:
+            return
+        self._fondo = self.copy_from_bbox(self.fig.bbox)
+        self._dibujar_artistas()
+
+    def _dibujar_artistas(self):
+        for artista in self.artistas:
+            artista.axes.draw_artist(artista)
+
+    def redibujar(self, completo=False):
+        if not self.blit_activo or completo or self._fondo is None:
+            self.draw()
+            return
+        self.restore_region(self._fondo)
+        self._dibujar_artistas()
+        self.blit(self.fig.bbox)
+
+
+# =======================
+# Gráfico Matplotlib para Superposición
+# =======================
+class SuperposicionMatplotlib(BlitCanvas):
+    def __init__(self, blit=True):
+        self.fig = Figure(figsize=(8, 6))
+        super().__init__(self.fig, blit)
+        self.ax1 = self.fig.add_subplot(311)
+        self.ax2 = self.fig.add_subplot(312, sharex=self.ax1)
+        self.ax3 = self.fig.add_subplot(313, sharex=self.ax1)
+
+        for ax in [self.ax1, self.ax2, self.ax3]:
+            ax.set_xlim(0, 4 * np.pi)
+            ax.set_ylim(-3, 3)
+            ax.grid(True)
+
+        self.line1, = self.ax1.plot([], [], 'b', label='Onda 1')
+        self.line2, = self.ax2.plot([], [], 'r', label='Onda 2')
+        self.line_sum, = self.ax3.plot([], [], 'g', label='Suma')
+        self.animar(self.line1, self.line2, self.line_sum)
+
+        self.ax3.set_xlabel("x (posición)")
+        self.ax1.legend(); self.ax2.legend(); self.ax3.legend()
+
+        # Con más muestras que píxeles se dibuja el mínimo y el máximo de
+        # cada columna
+        self.decimador = DecimadorMinMax()
+        self._decimadas = {}
+
+    def _decimar(self, nombre, y):
+        out = self._decimadas.get(nombre)
+        if out is None or len(out) != len(self.decimador.x):
+            out = self._decimadas[nombre] = np.empty(len(self.decimador.x))
+        return self.decimador.decimar(y, out)
+
+    def update_plot(self, x, y1, y2, y_sum=None):
+        if y_sum is None:
+            y_sum = y1 + y2
+        columnas = max(1, self.width())
+        if len(x) > 2 * columnas:
+            x = self.decimador.preparar(x, columnas)
+            y1 = self._decimar("y1", y1)
+            y2 = self._decimar("y2", y2)
+            y_sum = self._decimar("suma", y_sum)
+        self.line1.set_data(x, y1)
+        self.line2.set_data(x, y2)
+        self.line_sum.set_data(x, y_sum)
+        self.redibujar()
+
+# =======================
+# Gráfico Matplotlib para Estacionaria (traza partícula)
+# =======================
+class EstacionariaMatplotlib(BlitCanvas):
+    # Ventana visible de la traza y salto con el que se desplaza: los
+    # límites se mueven a saltos para no redibujar los ejes en cada frame
+    ANCHO = 10
+    SALTO = 5
+
+    def __init__(self, dt=0.1, blit=True):
+        self.fig = Figure(figsize=(5, 2))
+        super().__init__(self.fig, blit)
+        self.ax = self.fig.add_subplot(111)
+        self.ax.set_xlim(0, self.ANCHO)
+        self.ax.set_ylim(-2.5, 2.5)
+        self.punto, = self.ax.plot([], [], 'ro', markersize=8)
+        self.traza, = self.ax.plot([], [], 'b-', alpha=0.5)
+        self.animar(self.punto, self.traza)
+        self.ax.grid()
+        self.fig.tight_layout()
+        # Sólo se guarda lo que cabe en la ventana visible: (t, y) por fila
+        self.traza_datos = BufferCircular(int(np.ceil(self.ANCHO / dt)) + 1, (2,))
+
+    def reset(self):
+        self.traza_datos.limpiar()
+        self.punto.set_data([], [])
+        self.traza.set_data([], [])
+        self.ax.set_xlim(0, self.ANCHO)
+        self.draw()
+
+    def update_plot(self, t, y):
+        self.traza_datos.agregar((t, y))
+        datos = self.traza_datos.vista()
+        self.punto.set_data([t], [y])
+        self.traza.set_data(datos[:, 0], datos[:, 1])
+        x_min, x_max = self.ax.get_xlim()
+        if t + 1 > x_max:
+            x_min += self.SALTO * np.ceil((t + 1 - x_max) / self.SALTO)
+            self.ax.set_xlim(x_min, x_min + self.ANCHO)
+            self.redibujar(completo=True)
+        else:
+            self.redibujar()
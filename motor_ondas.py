@@ -0,0 +1,227 @@
+# Motor de ondas sin Qt: calcula bloques de frames (T x N) con numpy.
+# Lo usan los simuladores de la interfaz, pero también puede importarse
+# desde scripts o pruebas sin crear ningún widget.
+
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+# Parámetros de una onda viajera E0 * sin(k*x - w*t + phi)
+Onda = namedtuple("Onda", ["E0", "k", "w", "phi"])
+# Lo mismo para N componentes: cada campo es un array de longitud N
+Componentes = namedtuple("Componentes", ["E0", "k", "w", "phi"])
+
+FRAMES_POR_BLOQUE = 64
+# Tope de elementos por buffer de bloque (T*N), para mallas muy grandes
+MAX_ELEMENTOS_BLOQUE = 1 << 20
+# Tope de elementos de la base espacial de N componentes (2 x C x N, en
+# float32: 128 MB). Si no cabe se usan las componentes de mayor amplitud que
+# quepan: la base se calcula una vez y ningún bloque recalcula senos.
+MAX_ELEMENTOS_BASE = 1 << 25
+
+SERIES = ("cuadrada", "diente de sierra", "triangular", "batido", "paquete")
+
+# Modos del simulador, en el orden de sus botones
+MODOS = ("simple", "super", "est", "fourier")
+
+
+# =======================
+# Base espacial en caché
+# =======================
+class BaseEspacial:
+    # sin(k*x - w*t + phi) = sin(k*x + phi)*cos(w*t) - cos(k*x + phi)*sin(w*t)
+    # Los términos espaciales sólo dependen de (k, phi) y de la malla, así
+    # que se calculan una vez y cada frame es una combinación lineal.
+    def __init__(self, x, capacidad=8):
+        self.x = x
+        self.capacidad = capacidad
+        self._cache = OrderedDict()
+
+    def terminos(self, k, phi):
+        # Devuelve un array (2, N): fila 0 = sin(kx+phi), fila 1 = cos(kx+phi)
+        clave = (float(k), float(phi))
+        base = self._cache.get(clave)
+        if base is None:
+            fase = k * self.x + phi
+            base = np.empty((2, len(self.x)))
+            np.sin(fase, out=base[0])
+            np.cos(fase, out=base[1])
+            self._cache[clave] = base
+            if len(self._cache) > self.capacidad:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(clave)
+        return base
+
+
+# =======================
+# Motor de frames por bloques
+# =======================
+class MotorOndas:
+    def __init__(self, x):
+        self.set_malla(x)
+
+    def set_malla(self, x):
+        self.x = np.asarray(x, dtype=float)
+        self.base = BaseEspacial(self.x)
+        self._buffers = {}
+        self._base_comp = None
+        self._base_comp_clave = None
+        self._indices_comp = None
+        # Componentes usadas y omitidas en el último bloque de N componentes
+        self.componentes_usadas = 0
+        self.componentes_omitidas = 0
+
+    def frames_por_bloque(self, n=FRAMES_POR_BLOQUE):
+        # n frames, o menos si el bloque pasaría de MAX_ELEMENTOS_BLOQUE
+        return max(1, min(n, MAX_ELEMENTOS_BLOQUE // len(self.x)))
+
+    def tiempos(self, t0, dt, n=None):
+        if n is None:
+            n = self.frames_por_bloque()
+        return t0 + dt * np.arange(n)
+
+    def _buffer(self, nombre, forma, dtype=float):
+        # Los buffers de salida se reservan una vez y se reutilizan
+        # mientras no cambie la forma del bloque pedido.
+        buf = self._buffers.get(nombre)
+        if buf is None or buf.shape != forma:
+            buf = np.empty(forma, dtype=dtype)
+            self._buffers[nombre] = buf
+        return buf
+
+    def _salida(self, out, nombre, t):
+        if out is None:
+            out = self._buffer(nombre, (len(t), len(self.x)))
+        return out
+
+    def _viajera(self, onda, t, out):
+        # out[T, N] = [E0*cos(wt), -E0*sin(wt)] @ [sin(kx+phi); cos(kx+phi)]
+        base = self.base.terminos(onda.k, onda.phi)
+        wt = onda.w * t
+        coef = np.empty((len(t), 2))
+        np.cos(wt, out=coef[:, 0])
+        np.sin(wt, out=coef[:, 1])
+        coef[:, 0] *= onda.E0
+        coef[:, 1] *= -onda.E0
+        return np.matmul(coef, base, out=out)
+
+    def bloque_simple(self, t, onda, out=None):
+        t = np.atleast_1d(np.asarray(t, dtype=float))
+        return self._viajera(onda, t, self._salida(out, "y1", t))
+
+    def bloque_superposicion(self, t, onda1, onda2):
+        t = np.atleast_1d(np.asarray(t, dtype=float))
+        y1 = self._viajera(onda1, t, self._salida(None, "y1", t))
+        y2 = self._viajera(onda2, t, self._salida(None, "y2", t))
+        suma = np.add(y1, y2, out=self._salida(None, "suma", t))
+        return y1, y2, suma
+
+    def bloque_estacionaria(self, t, E0, k, w, px):
+        # y(x, t) = 2*E0*cos(k*x)*sin(w*t) y la partícula fija en x = px
+        t = np.atleast_1d(np.asarray(t, dtype=float))
+        amplitud = 2 * E0 * np.sin(w * t)
+        out = self._salida(None, "est", t)
+        np.multiply.outer(amplitud, self.base.terminos(k, 0.0)[1], out=out)
+        y_particula = amplitud * np.cos(k * px)
+        return out, y_particula
+
+    # ---- N componentes ----
+    def max_componentes(self):
+        return max(1, MAX_ELEMENTOS_BASE // (2 * len(self.x)))
+
+    def _base_componentes(self, comp):
+        # (2c, N): filas [0, c) = sin(k*x + phi), filas [c, 2c) = cos(k*x + phi)
+        # de las componentes elegidas, y sus índices. Se guarda mientras no
+        # cambien k, phi, las amplitudes ni la malla.
+        clave = (comp.E0.tobytes(), comp.k.tobytes(), comp.phi.tobytes())
+        if self._base_comp_clave == clave:
+            return self._base_comp, self._indices_comp
+        c = min(len(comp.k), self.max_componentes())
+        if c < len(comp.k):
+            # Las de mayor amplitud, en su orden original
+            indices = np.sort(np.argsort(-np.abs(comp.E0), kind="stable")[:c])
+        else:
+            indices = np.arange(c)
+        # Se libera la base anterior antes de reservar la nueva. La fase se
+        # calcula en float64 por filas (con k*x grande, float32 perdería
+        # decimales) y sólo se guarda en float32.
+        self._base_comp = None
+        base = np.empty((2 * c, len(self.x)), dtype=np.float32)
+        fase = self._buffer("fase_comp", (len(self.x),))
+        for fila, i in enumerate(indices):
+            np.multiply(comp.k[i], self.x, out=fase)
+            fase += comp.phi[i]
+            np.sin(fase, out=base[fila], casting="same_kind")
+            np.cos(fase, out=base[c + fila], casting="same_kind")
+        self._base_comp = base
+        self._base_comp_clave = clave
+        self._indices_comp = indices
+        return base, indices
+
+    def bloque_componentes(self, t, comp, out=None):
+        # y[T, N] = sum_c E_c*sin(k_c*x - w_c*t + phi_c), como un producto de
+        # matrices (T x 2C) @ (2C x N)
+        t = np.atleast_1d(np.asarray(t, dtype=float))
+        out = self._salida(out, "comp", t)
+        base, indices = self._base_componentes(comp)
+        c = len(indices)
+        self.componentes_usadas = c
+        self.componentes_omitidas = len(comp.k) - c
+        wt = self._buffer("wt_comp", (len(t), c))
+        np.multiply.outer(t, comp.w[indices], out=wt)
+        amplitud = comp.E0[indices]
+        coef = self._buffer("coef_comp", (len(t), 2 * c))
+        np.cos(wt, out=coef[:, :c])
+        np.sin(wt, out=coef[:, c:])
+        coef[:, :c] *= amplitud
+        coef[:, c:] *= -amplitud
+        coef32 = self._buffer("coef32_comp", coef.shape, np.float32)
+        coef32[:] = coef
+        return np.matmul(coef32, base, out=out)
+
+    # ---- por modo ----
+    def bloque_modo(self, modo, p, t, px=2 * np.pi):
+        # Bloque de un modo del simulador con los parámetros p (campos de
+        # parametros.Parametros); px es la partícula del modo estacionario
+        onda1 = Onda(p.E0, p.k, p.w, p.phi)
+        onda2 = Onda(p.E1, p.k1, p.w1, p.phi1)
+        if modo == "simple":
+            return (self.bloque_simple(t, onda1),)
+        elif modo == "super":
+            return self.bloque_superposicion(t, onda1, onda2)
+        elif modo == "est":
+            return self.bloque_estacionaria(t, p.E0, p.k, p.w, px)
+        elif modo == "fourier":
+            comp = serie_fourier(p.serie, p.n_armonicos, p.E0, p.k, p.w)
+            return (self.bloque_componentes(t, comp),)
+        raise ValueError(f"modo desconocido: {modo}")
+
+
+# =======================
+# Series predefinidas
+# =======================
+def serie_fourier(nombre, n, E0=1.0, k=1.0, w=1.0):
+    # Sumas parciales de n términos con fundamental (E0, k, w). Todas las
+    # componentes tienen w/k constante, así que la forma avanza sin deformarse.
+    if nombre == "cuadrada":
+        h = 2 * np.arange(n) + 1.0
+        amp = 4 / (np.pi * h)
+    elif nombre == "diente de sierra":
+        h = np.arange(1, n + 1.0)
+        amp = 2 / np.pi * (-1) ** (h + 1) / h
+    elif nombre == "triangular":
+        h = 2 * np.arange(n) + 1.0
+        amp = 8 / np.pi ** 2 * (-1) ** ((h - 1) // 2) / h ** 2
+    elif nombre == "batido":
+        # n ondas de igual amplitud repartidas en +-5% alrededor de k
+        h = 1 + np.linspace(-0.05, 0.05, n) if n > 1 else np.ones(1)
+        amp = np.full(n, 1.0 / n)
+    elif nombre == "paquete":
+        # Envolvente gaussiana en el número de onda
+        h = 1 + np.linspace(-0.5, 0.5, n) if n > 1 else np.ones(1)
+        amp = np.exp(-0.5 * ((h - 1) / 0.15) ** 2)
+        amp /= amp.sum()
+    else:
+        raise ValueError(f"serie desconocida: {nombre}")
+    return Componentes(E0 * amp, k * h, w * h, np.zeros(n))
@@ -10,6 +10,9 @@ from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import math
 
+from motor_ondas import SERIES, MotorOndas, Onda
+from parametros import CAMPOS_ONDA, ModeloParametros, Parametros
+
 class MatplotlibPlot(FigureCanvas):
     def __init__(self):
         self.fig = Figure(figsize=(5, 2))
@@ -35,6 +38,10 @@ class SimuladorOndas(QWidget):
         self.t = 0
         self.modo = "super"
         self.forzar_destruccion = False
+        self.dt = 0.1
+        self._bloque = None
+        self._bloque_clave = None
+        self._bloque_i = 0
         self.initUI()
         self.timer = QTimer()
         self.timer.timeout.connect(self.actualizar)
@@ -44,28 +51,21 @@ class SimuladorOndas(QWidget):
         layout = QVBoxLayout()
         self.param_layout = QGridLayout()
 
-        self.E0 = 1.0
-        self.k = 2 * np.pi
-        self.w = 3.0
-        self.phi = 0
-        self.E1 = 1.0
-        self.k1 = 2 * np.pi
-        self.w1 = 3.0
-        self.phi1 = math.pi
+        self.parametros = ModeloParametros(Parametros(
+            E0=1.0, k=2 * np.pi, w=3.0, phi=0,
+            E1=1.0, k1=2 * np.pi, w1=3.0, phi1=math.pi,
+            serie=SERIES[0], n_armonicos=1))
+        self.parametros.conectar(self.copiar_parametros)
+        self.copiar_parametros(self.parametros.valores)
 
         self.inputs = {}
-        labels = ["E0", "k", "w", "phi", "E1", "k1", "w1", "phi1"]
-        valores = [self.E0, self.k / np.pi, self.w, self.phi,
-                   self.E1, self.k1 / np.pi, self.w1, self.phi1]
-
-        for i, (label, val) in enumerate(zip(labels, valores)):
+        for i, label in enumerate(CAMPOS_ONDA):
             self.param_layout.addWidget(QLabel(label), i, 0)
-            entry = QLineEdit(str(val))
+            entry = QLineEdit(self.parametros.texto(label))
+            entry.editingFinished.connect(lambda label=label: self.editar_parametro(label))
             self.inputs[label] = entry
             self.param_layout.addWidget(entry, i, 1)
 
-        self.update_params()
-
         self.btn_simple = QPushButton("Onda Simple")
         self.btn_super = QPushButton("Superposición")
         self.btn_est = QPushButton("Estacionaria")
@@ -91,6 +91,7 @@ class SimuladorOndas(QWidget):
         self.matplot = MatplotlibPlot()
 
         self.x = np.linspace(0, 4 * np.pi, 500)
+        self.motor = MotorOndas(self.x)
 
         layout.addLayout(self.param_layout)
         layout.addLayout(self.control_layout)
@@ -102,64 +103,80 @@ class SimuladorOndas(QWidget):
         self.setModo("super")
 
     def setModo(self, modo):
-        self.update_params()
         self.modo = modo
         self.forzar_destruccion = False
         self.t = 0
+        self._bloque_clave = None
         self.plot2.setVisible(modo == "super")
         self.plot3.setVisible(modo == "super")
         self.matplot.setVisible(modo == "est")
 
-    def update_params(self):
+    def editar_parametro(self, nombre):
+        entrada = self.inputs[nombre]
         try:
-            self.E0 = float(self.inputs["E0"].text())
-            self.k = float(self.inputs["k"].text()) * np.pi
-            self.w = float(self.inputs["w"].text())
-            self.phi = float(self.inputs["phi"].text())
-            self.E1 = float(self.inputs["E1"].text())
-            self.k1 = float(self.inputs["k1"].text()) * np.pi
-            self.w1 = float(self.inputs["w1"].text())
-            self.phi1 = float(self.inputs["phi1"].text())
-        except:
-            pass
+            self.parametros.desde_texto(nombre, entrada.text())
+            entrada.setStyleSheet("")
+        except ValueError:
+            entrada.setStyleSheet("border: 1px solid red;")
+
+    def copiar_parametros(self, p):
+        self.E0, self.k, self.w, self.phi = p.E0, p.k, p.w, p.phi
+        self.E1, self.k1, self.w1, self.phi1 = p.E1, p.k1, p.w1, p.phi1
 
     def set_interferencia_destruccion(self):
-        self.inputs["E1"].setText(self.inputs["E0"].text())
-        self.inputs["k1"].setText(self.inputs["k"].text())
-        self.inputs["w1"].setText(self.inputs["w"].text())
-        phi_orig = float(self.inputs["phi"].text())
-        self.inputs["phi1"].setText(str(phi_orig + math.pi))
+        p = self.parametros.valores
+        self.parametros.cambiar(E1=p.E0, k1=p.k, w1=p.w, phi1=p.phi + math.pi)
+        for nombre in ["E1", "k1", "w1", "phi1"]:
+            self.inputs[nombre].setText(self.parametros.texto(nombre))
+            self.inputs[nombre].setStyleSheet("")
         self.setModo("super")
         self.forzar_destruccion = True
 
+    def calcular_bloque(self):
+        t = self.motor.tiempos(self.t, self.dt)
+        onda1 = Onda(self.E0, self.k, self.w, self.phi)
+        onda2 = Onda(self.E1, self.k1, self.w1, self.phi1)
+        if self.modo == "simple":
+            return (self.motor.bloque_simple(t, onda1),)
+        if self.modo == "est":
+            return self.motor.bloque_estacionaria(t, self.E0, self.k, self.w, 2 * np.pi)
+        if self.forzar_destruccion:
+            y1 = self.motor.bloque_simple(t, onda1)
+            y2 = np.negative(y1)
+            return y1, y2, y1 + y2
+        return self.motor.bloque_superposicion(t, onda1, onda2)
+
+    def siguiente_frame(self):
+        clave = (self.modo, self.forzar_destruccion, self.parametros.version)
+        if clave != self._bloque_clave or self._bloque_i >= len(self._bloque[0]):
+            self._bloque = self.calcular_bloque()
+            self._bloque_clave = clave
+            self._bloque_i = 0
+        i = self._bloque_i
+        self._bloque_i += 1
+        return [datos[i] for datos in self._bloque]
+
     def actualizar(self):
-        self.update_params()
-        t = self.t
         x = self.x
-        y1 = self.E0 * np.sin(self.k * x - self.w * t + self.phi)
-
-        if self.forzar_destruccion:
-            y2 = -y1
-        else:
-            y2 = self.E1 * np.sin(self.k1 * x - self.w1 * t + self.phi1)
+        frame = self.siguiente_frame()
 
         if self.modo == "simple":
+            y1 = frame[0]
             self.curve1.setData(x, y1)
             self.curve2.clear()
             self.curve3.clear()
 
         elif self.modo == "super":
-            y_total = y1 + y2
+            y1, y2, y_total = frame
             self.curve1.setData(x, y1)
             self.curve2.setData(x, y2)
             self.curve3.setData(x, y_total)
 
         elif self.modo == "est":
-            y_est = 2 * self.E0 * np.cos(self.k * x) * np.sin(self.w * t)
+            y_est, y_p = frame
             self.curve1.setData(x, y_est)
             self.curve2.clear()
             self.curve3.clear()
-            y_p = 2 * self.E0 * np.cos(self.k * 2*np.pi) * np.sin(self.w * t)
             self.matplot.update_point(y_p)
 
-        self.t += 0.1
+        self.t += self.dt
@@ -1,100 +1,235 @@
 # Requiere: pip install PyQt5 pyqtgraph sounddevice matplotlib numpy
 
+import time
+_T_INICIO = time.perf_counter()
+
+import argparse
+import importlib
 import sys
 import numpy as np
-import sounddevice as sd
 import math
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QTabWidget, QVBoxLayout, QLabel,
     QHBoxLayout, QPushButton, QLineEdit, QGridLayout, QGroupBox,
-    QSizePolicy, QSpacerItem
+    QSizePolicy, QSpacerItem, QFileDialog, QComboBox, QMessageBox, QCheckBox
 )
-from PyQt5.QtCore import QTimer
+from PyQt5.QtCore import QTimer, QEvent, QObject, QRectF
 from PyQt5.QtCore import Qt
-import pyqtgraph as pg
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
 from PyQt5.QtWidgets import QScrollArea, QGroupBox
 
+import backend_audio
+from buffer_circular import AnilloAudio
+from calculadora import ETIQUETAS, resolver
+from cancelacion import ControlRealimentado
+from ecuacion_ondas import CONTORNOS, SolverOndas1D, modo_propio, pulso
+from espectro import Espectrograma
+from grabadora import FORMATOS as FORMATOS_GRABACION, GrabadoraSesion
+from medidor import MedidorCancelacion
+from telemetria import CALCULO, DATOS, DIBUJO, PARAMETROS, PerfilFrames, TelemetriaAudio
+from motor_ondas import FRAMES_POR_BLOQUE, SERIES, MotorOndas
+from particulas import DISPOSICIONES, Particulas, reposo
+from parametros import CAMPOS_ONDA, PARAMETROS_INICIALES, ModeloParametros
+from resolucion import k_max_modo, tamano_malla
+
+_T_IMPORTADO = time.perf_counter()
+
 
 # =======================
-# Gráfico Matplotlib para Superposición
+# Importaciones diferidas
 # =======================
-class SuperposicionMatplotlib(FigureCanvas):
-    def __init__(self):
-        self.fig = Figure(figsize=(8, 6))
-        super().__init__(self.fig)
-        self.ax1 = self.fig.add_subplot(311)
-        self.ax2 = self.fig.add_subplot(312, sharex=self.ax1)
-        self.ax3 = self.fig.add_subplot(313, sharex=self.ax1)
-
-        for ax in [self.ax1, self.ax2, self.ax3]:
-            ax.set_xlim(0, 4 * np.pi)
-            ax.set_ylim(-3, 3)
-            ax.grid(True)
-
-        self.line1, = self.ax1.plot([], [], 'b', label='Onda 1')
-        self.line2, = self.ax2.plot([], [], 'r', label='Onda 2')
-        self.line_sum, = self.ax3.plot([], [], 'g', label='Suma')
-
-        self.ax3.set_xlabel("x (posición)")
-        self.ax1.legend(); self.ax2.legend(); self.ax3.legend()
-
-    def update_plot(self, x, y1, y2):
-        self.line1.set_data(x, y1)
-        self.line2.set_data(x, y2)
-        self.line_sum.set_data(x, y1 + y2)
-        self.draw()
+# Tiempo (s) que tardó cada módulo diferido en importarse
+TIEMPOS_IMPORTACION = {}
+
+
+class ImportDiferido:
+    # Se comporta como el módulo, pero no lo importa hasta el primer acceso
+    # a uno de sus atributos. Así pyqtgraph y matplotlib no
+    # cuestan nada hasta que se abre la pestaña que los usa.
+    def __init__(self, nombre):
+        self._nombre = nombre
+        self._modulo = None
+
+    def __getattr__(self, atributo):
+        if self._modulo is None:
+            inicio = time.perf_counter()
+            self._modulo = importlib.import_module(self._nombre)
+            TIEMPOS_IMPORTACION[self._nombre] = time.perf_counter() - inicio
+        return getattr(self._modulo, atributo)
+
+
+pg = ImportDiferido("pyqtgraph")
+graficos = ImportDiferido("graficos_mpl")
+
+
+def __getattr__(nombre):
+    # oladefinitivo.SuperposicionMatplotlib, etc. siguen funcionando
+    if nombre in ("BlitCanvas", "SuperposicionMatplotlib", "EstacionariaMatplotlib"):
+        return getattr(graficos, nombre)
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+
 
 # =======================
-# Gráfico Matplotlib para Estacionaria (traza partícula)
+# Reloj de frames
 # =======================
-class EstacionariaMatplotlib(FigureCanvas):
-    def __init__(self):
-        self.fig = Figure(figsize=(5, 2))
-        super().__init__(self.fig)
-        self.ax = self.fig.add_subplot(111)
-        self.ax.set_xlim(0, 10)
-        self.ax.set_ylim(-2.5, 2.5)
-        self.punto, = self.ax.plot([], [], 'ro', markersize=8)
-        self.traza, = self.ax.plot([], [], 'b-', alpha=0.5)
-        self.ax.grid()
-        self.fig.tight_layout()
-        self.t_data = []
-        self.y_data = []
-
-    def reset(self):
-        self.t_data.clear()
-        self.y_data.clear()
-        self.punto.set_data([], [])
-        self.traza.set_data([], [])
-        self.ax.set_xlim(0, 10)
-        self.draw()
-
-    def update_plot(self, t, y):
-        self.t_data.append(t)
-        self.y_data.append(y)
-        self.punto.set_data([t], [y])
-        self.traza.set_data(self.t_data, self.y_data)
-        self.ax.set_xlim(max(0, t - 5), t + 1)
-        self.draw()
+class PlanificadorFrames(QObject):
+    # Un único QTimer para toda la aplicación. En cada tick llama a
+    # funcion(segundos) de los widgets registrados que se ven, con el tiempo
+    # real transcurrido desde su frame anterior (perf_counter es monótono),
+    # así la simulación avanza igual a 60 fps que a 15. El timer se para
+    # cuando no se ve ninguno (menú inicial, otra pestaña, ventana
+    # minimizada).
+    FPS = 60
+    # Un paso mayor (p. ej. tras suspender el equipo) se recorta
+    MAX_PASO = 0.25
+
+    def __init__(self, fps=FPS):
+        super().__init__()
+        self.timer = QTimer()
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.tick)
+        self._suscriptores = {}
+        self._fin = 0.0
+        self.frames = 0
+        self.saltados = 0
+        self.set_fps(fps)
+
+    def set_fps(self, fps):
+        self.fps = fps
+        self.intervalo = 1 / fps
+        self.timer.setInterval(max(1, round(1000 / fps)))
+
+    def registrar(self, widget, funcion):
+        # [funcion, instante del último frame o None]
+        self._suscriptores[widget] = [funcion, None]
+        widget.installEventFilter(self)
+        self.revisar()
+
+    def quitar(self, widget):
+        if self._suscriptores.pop(widget, None) is not None:
+            widget.removeEventFilter(self)
+        self.revisar()
+
+    def visible(self, widget):
+        return widget.isVisible() and not widget.window().isMinimized()
+
+    def eventFilter(self, obj, event):
+        if event.type() in (QEvent.Show, QEvent.Hide) and obj in self._suscriptores:
+            # Al volver a verse no se recupera el tiempo oculto
+            self._suscriptores[obj][1] = None
+            # La visibilidad de la ventana aún no está actualizada aquí
+            QTimer.singleShot(0, self.revisar)
+        return False
+
+    def revisar(self):
+        if any(self.visible(w) for w in self._suscriptores):
+            if not self.timer.isActive():
+                self.timer.start()
+        else:
+            self.timer.stop()
+
+    def tick(self):
+        ahora = time.perf_counter()
+        # Si el frame anterior acabó hace menos de medio intervalo (el
+        # trabajo no cabe en el intervalo y Qt encadena los ticks), se salta
+        # este para dejar pasar los eventos de la interfaz; el siguiente
+        # frame cubre el tiempo perdido de una vez.
+        if ahora - self._fin < 0.5 * self.intervalo:
+            self.saltados += 1
+            return
+        for widget, suscriptor in list(self._suscriptores.items()):
+            if not self.visible(widget):
+                suscriptor[1] = None
+                continue
+            funcion, ultimo = suscriptor
+            segundos = 0.0 if ultimo is None else min(ahora - ultimo, self.MAX_PASO)
+            suscriptor[1] = ahora
+            funcion(segundos)
+        self.frames += 1
+        self._fin = time.perf_counter()
+
+
+_PLANIFICADOR = None
+
+
+def planificador():
+    # Se crea con el primer widget que lo necesita (hace falta la QApplication)
+    global _PLANIFICADOR
+    if _PLANIFICADOR is None:
+        _PLANIFICADOR = PlanificadorFrames()
+    return _PLANIFICADOR
+
 
 # =======================
 # Simulador de Ondas
 # =======================
+def mover_puntos(scatter, x, y):
+    # Mueve los puntos de un ScatterPlotItem sin recrearlos: setData
+    # reconstruye los registros de cada punto y con miles es 4 veces más lento
+    scatter.data['x'] = x
+    scatter.data['y'] = y
+    scatter.prepareGeometryChange()
+    scatter.bounds = [None, None]
+    scatter.invalidate()
+
+
 class SimuladorOndas(QWidget):
+    SEGUNDOS_EXPORTAR = 10
+    # Modo campo 2D: malla de N_CAMPO x N_CAMPO puntos sobre un cuadrado de
+    # lado `longitud` centrado en el origen
+    N_CAMPO = 1000
+    VISTAS_CAMPO = ("Instantáneo", "Intensidad media (dB)", "Atenuación (dB)")
+    # Modo ecuación de ondas: tope de celdas actualizadas por frame (pasos
+    # x puntos); con mallas muy finas la simulación va más lenta
+    MAX_CELDAS_FRAME = 4_000_000
+    INICIALES = ("Pulso", "Modo propio")
+    # Partículas del modo estacionario: cuántas al empezar, frames de rastro
+    # y escala del desplazamiento longitudinal respecto al transversal
+    N_PARTICULAS = 500
+    RASTRO = 16
+    # Rastros dibujados como mucho: con más partículas se dibuja uno de
+    # cada n, que a la resolución de la pantalla no se distingue
+    MAX_RASTROS = 1000
+    # Perfil: frames grabados por traza y frames que resume el HUD
+    FRAMES_TRAZA = 300
+    FRAMES_HUD = 120
+    ESCALA_LONGITUDINAL = 0.1
+
     def __init__(self):
         super().__init__()
         self.t = 0
         self.modo = "simple"
-        self.x = np.linspace(0, 4 * np.pi, 500)
+        # Unidades de tiempo de simulación por segundo real, y paso entre
+        # frames precalculados a la tasa del planificador
+        self.velocidad = 10 / 3
+        self.dt = self.velocidad / planificador().fps
+        self.longitud = 4 * np.pi
+        self.x = np.linspace(0, self.longitud, 500)
         self.px = 2 * np.pi  # Posición de la partícula
+        # Con None la malla se ajusta al ancho en píxeles y al mayor k
+        self.malla_fija = None
+
+        # Frames precalculados por el motor; se recalculan al agotarse
+        # o cuando cambian el modo o los parámetros
+        self.motor = MotorOndas(self.x)
+        self.frames_bloque = FRAMES_POR_BLOQUE
+        self._bloque = None
+        self._bloque_clave = None
+        self._bloque_t0 = 0
+        # Campo 2D (campo2d.Campo2D); se crea al entrar en el modo
+        self.campo = None
+        self._campo_dibujado = None
+        # Solver de diferencias finitas (ecuacion_ondas.SolverOndas1D) y
+        # los parámetros con los que se inició
+        self.solver = None
+        self._solver_clave = None
+        # Partículas del medio (particulas.Particulas) del modo estacionario
+        self.particulas = None
+        # Tiempos por etapa de cada frame; el HUD y la traza los leen
+        self.perfil = PerfilFrames()
+        self._ultimo_hud = 0
 
         self.initUI()
-
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.actualizar)
-        self.timer.start(30)
+        planificador().registrar(self, self.actualizar)
 
     def initUI(self):
 
@@ -106,23 +241,16 @@ class SimuladorOndas(QWidget):
         group_box = QGroupBox("Parámetros de la Onda")
         self.param_layout = QGridLayout()
 
-        self.E0 = 2.0
-        self.k = np.pi
-        self.w = 5.0
-        self.phi = 0.5
-        self.E1 = 1.5
-        self.k1 = 1.5 * np.pi
-        self.w1 = 4.0
-        self.phi1 = math.pi
+        # Los campos se interpretan al terminar de editarlos, no en cada tick
+        self.parametros = ModeloParametros(PARAMETROS_INICIALES)
+        self.parametros.conectar(self.parametros_cambiados)
+        self.copiar_parametros(self.parametros.valores)
 
         self.inputs = {}
-        labels = ["E0", "k", "w", "phi", "E1", "k1", "w1", "phi1"]
-        valores = [self.E0, self.k / np.pi, self.w, self.phi,
-                self.E1, self.k1 / np.pi, self.w1, self.phi1]
-
-        for i, (label, val) in enumerate(zip(labels, valores)):
+        for i, label in enumerate(CAMPOS_ONDA):
             self.param_layout.addWidget(QLabel(label), i, 0)
-            entry = QLineEdit(str(val))
+            entry = QLineEdit(self.parametros.texto(label))
+            entry.editingFinished.connect(lambda label=label: self.editar_parametro(label))
             self.inputs[label] = entry
             self.param_layout.addWidget(entry, i, 1)
 
@@ -142,31 +270,188 @@ class SimuladorOndas(QWidget):
         self.btn_super = QPushButton("Superposición")
         self.btn_est = QPushButton("Estacionaria")
         self.btn_destructiva = QPushButton("Ejemplo Interferencia Destructiva Total")
+        self.btn_fourier = QPushButton("Serie de Fourier")
+        self.btn_campo = QPushButton("Campo 2D")
+        self.btn_numerico = QPushButton("Ecuación de Ondas")
+        self.btn_exportar = QPushButton("Exportar animación")
 
         self.btn_simple.clicked.connect(lambda: self.setModo("simple"))
         self.btn_super.clicked.connect(lambda: self.setModo("super"))
         self.btn_est.clicked.connect(lambda: self.setModo("est"))
         self.btn_destructiva.clicked.connect(self.set_interferencia_destr)
+        self.btn_fourier.clicked.connect(lambda: self.setModo("fourier"))
+        self.btn_campo.clicked.connect(lambda: self.setModo("campo"))
+        self.btn_numerico.clicked.connect(lambda: self.setModo("numerico"))
+        self.btn_exportar.clicked.connect(self.exportar_animacion)
 
         self.control_layout = QHBoxLayout()
-        for btn in [self.btn_simple, self.btn_super, self.btn_est, self.btn_destructiva]:
+        for btn in [self.btn_simple, self.btn_super, self.btn_est, self.btn_destructiva,
+                    self.btn_fourier, self.btn_campo, self.btn_numerico,
+                    self.btn_exportar]:
             self.control_layout.addWidget(btn)
 
         layout.addLayout(self.control_layout)
 
+        # Perfil del bucle de frames: HUD con p50/p99 por etapa y grabación
+        # de una traza de Chrome (y opcionalmente de cProfile)
+        perfil_layout = QHBoxLayout()
+        self.check_hud = QCheckBox("Perfil (HUD)")
+        self.check_hud.toggled.connect(self.mostrar_hud)
+        self.input_frames_traza = QLineEdit(str(self.FRAMES_TRAZA))
+        self.check_cprofile = QCheckBox("cProfile")
+        self.btn_traza = QPushButton("Grabar traza")
+        self.btn_traza.clicked.connect(self.grabar_traza)
+        perfil_layout.addWidget(self.check_hud)
+        perfil_layout.addStretch(1)
+        perfil_layout.addWidget(QLabel("Frames"))
+        perfil_layout.addWidget(self.input_frames_traza)
+        perfil_layout.addWidget(self.check_cprofile)
+        perfil_layout.addWidget(self.btn_traza)
+        layout.addLayout(perfil_layout)
+
+        # El HUD flota sobre los gráficos, en la esquina superior derecha
+        self.hud = QLabel(self)
+        self.hud.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.hud.setStyleSheet("background: rgba(0, 0, 0, 170); color: white; padding: 6px;"
+                               " font-family: monospace; font-size: 11px;")
+        self.hud.hide()
+
+        # Serie y número de componentes del modo Fourier; la fundamental
+        # usa E0, k y w
+        self.fourier_widget = QWidget()
+        fourier_layout = QHBoxLayout()
+        fourier_layout.setContentsMargins(0, 0, 0, 0)
+        self.combo_serie = QComboBox()
+        self.combo_serie.addItems(SERIES)
+        self.combo_serie.currentTextChanged.connect(lambda serie: self.parametros.cambiar(serie=serie))
+        self.input_armonicos = QLineEdit(self.parametros.texto("n_armonicos"))
+        self.input_armonicos.editingFinished.connect(lambda: self.editar_parametro("n_armonicos"))
+        self.inputs["n_armonicos"] = self.input_armonicos
+        fourier_layout.addWidget(self.combo_serie)
+        fourier_layout.addWidget(QLabel("Componentes"))
+        fourier_layout.addWidget(self.input_armonicos)
+        # Componentes que no caben en la base del motor con esta malla
+        self.label_omitidas = QLabel("")
+        fourier_layout.addWidget(self.label_omitidas)
+        self.fourier_widget.setLayout(fourier_layout)
+        layout.addWidget(self.fourier_widget)
+
+        # Vista del modo campo 2D: el ruido primario usa E0 y phi, el
+        # altavoz de antirruido E1 y phi1; los dos, k y w
+        self.campo_widget = QWidget()
+        campo_layout = QHBoxLayout()
+        campo_layout.setContentsMargins(0, 0, 0, 0)
+        self.combo_vista_campo = QComboBox()
+        self.combo_vista_campo.addItems(self.VISTAS_CAMPO)
+        self.combo_vista_campo.currentIndexChanged.connect(self.cambiar_vista_campo)
+        campo_layout.addWidget(self.combo_vista_campo)
+        campo_layout.addWidget(QLabel("Arrastra las fuentes; en azul, las zonas de silencio"))
+        self.campo_widget.setLayout(campo_layout)
+        layout.addWidget(self.campo_widget)
+
+        # Modo ecuación de ondas: velocidad w/k, amplitud E0
+        self.numerico_widget = QWidget()
+        numerico_layout = QHBoxLayout()
+        numerico_layout.setContentsMargins(0, 0, 0, 0)
+        self.combo_contorno = QComboBox()
+        self.combo_contorno.addItems(CONTORNOS)
+        self.combo_contorno.currentTextChanged.connect(
+            lambda contorno: self.parametros.cambiar(contorno=contorno))
+        self.input_gamma = QLineEdit(self.parametros.texto("gamma"))
+        self.input_gamma.editingFinished.connect(lambda: self.editar_parametro("gamma"))
+        self.inputs["gamma"] = self.input_gamma
+        self.combo_inicial = QComboBox()
+        self.combo_inicial.addItems(self.INICIALES)
+        self.combo_inicial.currentIndexChanged.connect(self.reiniciar_solver)
+        self.btn_reiniciar = QPushButton("Reiniciar")
+        self.btn_reiniciar.clicked.connect(self.reiniciar_solver)
+        numerico_layout.addWidget(QLabel("Extremos"))
+        numerico_layout.addWidget(self.combo_contorno)
+        numerico_layout.addWidget(QLabel("Amortiguamiento (γ)"))
+        numerico_layout.addWidget(self.input_gamma)
+        numerico_layout.addWidget(self.combo_inicial)
+        numerico_layout.addWidget(self.btn_reiniciar)
+        # Por qué no hay simulación (w = 0 o k = 0)
+        self.label_solver = QLabel("")
+        numerico_layout.addWidget(self.label_solver)
+        self.numerico_widget.setLayout(numerico_layout)
+        layout.addWidget(self.numerico_widget)
+
+        # Partículas del modo estacionario
+        self.particulas_widget = QWidget()
+        particulas_layout = QHBoxLayout()
+        particulas_layout.setContentsMargins(0, 0, 0, 0)
+        self.input_particulas = QLineEdit(str(self.N_PARTICULAS))
+        self.input_particulas.editingFinished.connect(self.crear_particulas)
+        self.combo_disposicion = QComboBox()
+        self.combo_disposicion.addItems(DISPOSICIONES)
+        self.combo_disposicion.currentIndexChanged.connect(self.crear_particulas)
+        self.combo_direccion = QComboBox()
+        self.combo_direccion.addItems(["transversal", "longitudinal"])
+        self.combo_direccion.currentIndexChanged.connect(self.crear_particulas)
+        self.check_rastro = QCheckBox("Rastro")
+        self.check_rastro.toggled.connect(self.crear_particulas)
+        particulas_layout.addWidget(QLabel("Partículas"))
+        particulas_layout.addWidget(self.input_particulas)
+        particulas_layout.addWidget(self.combo_disposicion)
+        particulas_layout.addWidget(self.combo_direccion)
+        particulas_layout.addWidget(self.check_rastro)
+        self.particulas_widget.setLayout(particulas_layout)
+        layout.addWidget(self.particulas_widget)
+
         # =====================
         # Gráficos
         # =====================
         self.plot_simple = pg.PlotWidget(title="Onda Simple")
         self.curve_simple = self.plot_simple.plot(pen='b')
 
-        self.mpl_super = SuperposicionMatplotlib()
-        self.mpl_est = EstacionariaMatplotlib()
+        self.mpl_super = graficos.SuperposicionMatplotlib()
+        self.mpl_est = graficos.EstacionariaMatplotlib(self.dt)
         self.plot_est = pg.PlotWidget(title="Onda Estacionaria")
         self.curve_est = self.plot_est.plot(pen='g')
+        self.curve_rastro = pg.PlotCurveItem(pen=(120, 40, 40))
+        self.scatter_particulas = pg.ScatterPlotItem(size=5, pen=None, brush='r')
+        # En el ViewBox, fuera de las curvas del PlotItem, que intentaría
+        # reducirlas como si fueran curvas y = f(x)
+        self.plot_est.getViewBox().addItem(self.curve_rastro)
+        self.plot_est.getViewBox().addItem(self.scatter_particulas)
+        self.plot_fourier = pg.PlotWidget(title="Síntesis de Fourier")
+        self.curve_fourier = self.plot_fourier.plot(pen='m')
+        self.plot_numerico = pg.PlotWidget(title="Ecuación de Ondas (diferencias finitas)")
+        self.curve_numerico = self.plot_numerico.plot(pen='c')
+        self.plot_campo = pg.PlotWidget(title="Campo 2D")
+        self.plots_pg = [self.plot_simple, self.plot_est, self.plot_fourier,
+                         self.plot_numerico, self.plot_campo]
+        # Gráfico principal de cada modo: la malla se ajusta a su ancho, que
+        # no es el del simulador (márgenes, ejes, la partícula al lado)
+        self.graficos_modo = {"simple": self.plot_simple, "super": self.mpl_super,
+                              "est": self.plot_est, "fourier": self.plot_fourier,
+                              "campo": self.plot_campo, "numerico": self.plot_numerico}
+        for grafico in self.graficos_modo.values():
+            grafico.installEventFilter(self)
+        self.plot_campo.setAspectLocked(True)
+        self.imagen_campo = pg.ImageItem(axisOrder="row-major")
+        self.plot_campo.addItem(self.imagen_campo)
+        lado = self.longitud
+        self.imagen_campo.setRect(QRectF(-lado / 2, -lado / 2, lado, lado))
+        self.fuentes_campo = []
+        for i, (x, color, nombre) in enumerate([(-lado / 4, 'r', "Ruido"),
+                                                 (-lado / 4 + 0.5, 'g', "Antirruido")]):
+            fuente = pg.TargetItem(pos=(x, 0), movable=True, pen=color, label=nombre)
+            fuente.sigPositionChanged.connect(lambda item, i=i: self.mover_fuente(i, item.pos()))
+            self.plot_campo.addItem(fuente)
+            self.fuentes_campo.append(fuente)
+
+        # pyqtgraph dibuja sólo lo visible y reduce a mínimo/máximo por píxel
+        for plot in [self.plot_simple, self.plot_est, self.plot_fourier, self.plot_numerico]:
+            plot.setDownsampling(auto=True, mode='peak')
+            plot.setClipToView(True)
 
         layout.addWidget(self.plot_simple)
         layout.addWidget(self.mpl_super)
+        layout.addWidget(self.plot_fourier)
+        layout.addWidget(self.plot_campo)
+        layout.addWidget(self.plot_numerico)
 
         estacionaria_layout = QHBoxLayout()
         estacionaria_layout.addWidget(self.plot_est, 1)
@@ -177,64 +462,402 @@ class SimuladorOndas(QWidget):
         self.setModo("super")
 
     def setModo(self, modo):
-        self.update_params()
         self.modo = modo
+        # El HUD sólo resume frames del modo actual
+        self._hud_desde = self.perfil.n
         self.t = 0
+        self._bloque_clave = None
+        self.ajustar_malla()
         self.mpl_est.reset()
         self.plot_simple.setVisible(modo == "simple")
         self.mpl_super.setVisible(modo == "super")
         self.plot_est.setVisible(modo == "est")
         self.mpl_est.setVisible(modo == "est")
-
-    def update_params(self):
+        self.plot_fourier.setVisible(modo == "fourier")
+        self.fourier_widget.setVisible(modo == "fourier")
+        self.plot_campo.setVisible(modo == "campo")
+        self.campo_widget.setVisible(modo == "campo")
+        if modo == "campo" and self.campo is None:
+            self.crear_campo()
+        self.particulas_widget.setVisible(modo == "est")
+        if self.particulas is not None:
+            self.particulas.reiniciar()
+        elif modo == "est":
+            self.crear_particulas()
+        self.plot_numerico.setVisible(modo == "numerico")
+        self.numerico_widget.setVisible(modo == "numerico")
+        if modo == "numerico":
+            self.reiniciar_solver()
+
+    def editar_parametro(self, nombre):
+        entrada = self.inputs[nombre]
         try:
-            self.E0 = float(self.inputs["E0"].text())
-            self.k = float(self.inputs["k"].text()) * np.pi
-            self.w = float(self.inputs["w"].text())
-            self.phi = float(self.inputs["phi"].text())
-            self.E1 = float(self.inputs["E1"].text())
-            self.k1 = float(self.inputs["k1"].text()) * np.pi
-            self.w1 = float(self.inputs["w1"].text())
-            self.phi1 = float(self.inputs["phi1"].text())
-        except:
-            pass
+            self.parametros.desde_texto(nombre, entrada.text())
+            entrada.setStyleSheet("")
+        except ValueError:
+            # Se marca el campo y se mantiene el último valor válido
+            entrada.setStyleSheet("border: 1px solid red;")
+
+    def copiar_parametros(self, p):
+        self.E0, self.k, self.w, self.phi = p.E0, p.k, p.w, p.phi
+        self.E1, self.k1, self.w1, self.phi1 = p.E1, p.k1, p.w1, p.phi1
+        self.serie = p.serie
+        self.n_armonicos = p.n_armonicos
+
+    def parametros_cambiados(self, p):
+        self.copiar_parametros(p)
+        self.ajustar_malla()
+        if self.campo is not None:
+            if p.k != self.campo.k:
+                self.campo.set_k(p.k)
+            self.campo.cambiar(0, amplitud=p.E0, fase=p.phi)
+            self.campo.cambiar(1, amplitud=p.E1, fase=p.phi1)
+        # El contorno y el amortiguamiento se cambian sin reiniciar; el
+        # resto de cambios reinicia el solver en el siguiente frame
+        if self.solver is not None:
+            self.solver.set_contorno(p.contorno)
+            self.solver.set_gamma(p.gamma)
 
     def set_interferencia_destr(self):
-        self.inputs["E1"].setText(self.inputs["E0"].text())
-        self.inputs["k1"].setText(self.inputs["k"].text())
-        self.inputs["w1"].setText(self.inputs["w"].text())
-        phi_orig = float(self.inputs["phi"].text())
-        self.inputs["phi1"].setText(str(phi_orig + math.pi))
+        p = self.parametros.valores
+        self.parametros.cambiar(E1=p.E0, k1=p.k, w1=p.w, phi1=p.phi + math.pi)
+        for nombre in ["E1", "k1", "w1", "phi1"]:
+            self.inputs[nombre].setText(self.parametros.texto(nombre))
+            self.inputs[nombre].setStyleSheet("")
         self.setModo("super")
 
-    def actualizar(self):
-        self.update_params()
-        t = self.t
+    # =====================
+    # Campo 2D
+    # =====================
+    def crear_campo(self):
+        from campo2d import Campo2D, Fuente
+        p = self.parametros.valores
+        ejes = np.linspace(-self.longitud / 2, self.longitud / 2, self.N_CAMPO)
+        self.campo = Campo2D(ejes, ejes, p.k)
+        # Imagen que se reescribe en cada frame; ImageItem la dibuja sin copiarla
+        self._imagen_campo = np.empty(self.campo.forma, dtype=np.float32)
+        for fuente, amplitud, fase in zip(self.fuentes_campo, (p.E0, p.E1), (p.phi, p.phi1)):
+            pos = fuente.pos()
+            self.campo.agregar(Fuente(pos.x(), pos.y(), amplitud, fase))
+        self.cambiar_vista_campo()
+
+    def mover_fuente(self, i, pos):
+        # Sólo se recalculan los fasores de la fuente movida
+        if self.campo is not None:
+            self.campo.cambiar(i, x=pos.x(), y=pos.y())
+
+    def cambiar_vista_campo(self):
+        vista = self.combo_vista_campo.currentIndex()
+        if vista == 0:
+            lim = abs(self.E0) + abs(self.E1)
+            self.imagen_campo.setColorMap(pg.colormap.get("CET-D1"))
+            self.imagen_campo.setLevels((-lim, lim))
+        elif vista == 1:
+            self.imagen_campo.setColorMap(pg.colormap.get("viridis"))
+            self.imagen_campo.setLevels((-30, 10))
+        else:
+            # Centrada en 0 dB: azul donde el antirruido reduce el ruido
+            self.imagen_campo.setColorMap(pg.colormap.get("CET-D1"))
+            self.imagen_campo.setLevels((-20, 20))
+        self._campo_dibujado = None
+
+    def actualizar_campo(self):
+        # El instantáneo cambia cada frame, pero sólo cuesta combinar los
+        # fasores ya calculados; las vistas medias se redibujan al cambiar
+        vista = self.combo_vista_campo.currentIndex()
+        if vista == 0:
+            imagen = self.campo.instantaneo(self.w * self.t, out=self._imagen_campo)
+        elif self._campo_dibujado == self.campo.version:
+            return
+        elif vista == 1:
+            imagen = self.campo.intensidad_db(out=self._imagen_campo)
+        else:
+            imagen = self.campo.atenuacion_db(out=self._imagen_campo)
+        self.perfil.marca(CALCULO)
+        self._campo_dibujado = self.campo.version
+        self.imagen_campo.setImage(imagen, autoLevels=False)
+        self.perfil.marca(DATOS)
+
+    # =====================
+    # Partículas
+    # =====================
+    def crear_particulas(self):
+        try:
+            n = int(self.input_particulas.text())
+            if n < 1:
+                raise ValueError
+            self.input_particulas.setStyleSheet("")
+        except ValueError:
+            self.input_particulas.setStyleSheet("border: 1px solid red;")
+            return
+        x0, y0 = reposo(n, self.longitud, self.combo_disposicion.currentText(), 2 * abs(self.E0))
+        historia = self.RASTRO if self.check_rastro.isChecked() else 0
+        self.particulas = Particulas(x0, y0, historia, self.combo_direccion.currentIndex() == 1)
+        # Los puntos se crean aquí una vez; en cada frame sólo se mueven
+        self.scatter_particulas.setData(x=x0, y=y0)
+        self.curve_rastro.clear()
+
+    def mover_particulas(self, t):
+        p = self.particulas
+        escala = self.ESCALA_LONGITUDINAL if p.longitudinal else 1
+        p.estacionaria(escala * 2 * self.E0 * np.sin(self.w * t), self.k)
+        self.perfil.marca(CALCULO)
+        mover_puntos(self.scatter_particulas, p.x, p.y)
+        self.perfil.marca(DATOS)
+        if p.rastro is None:
+            return
+        trazas = p.trazas()[:, ::max(1, len(p) // self.MAX_RASTROS)]
+        self.perfil.marca(CALCULO)
+        self.curve_rastro.setData(trazas[0].ravel(), trazas[1].ravel(), connect="pairs")
+        self.perfil.marca(DATOS)
+
+    # =====================
+    # Ecuación de ondas
+    # =====================
+    def reiniciar_solver(self):
+        p = self.parametros.valores
+        self._solver_clave = (p.E0, p.k, p.w, len(self.x))
+        self.solver = None
+        self.curve_numerico.clear()
+        try:
+            solver = SolverOndas1D(self.x, abs(p.w / p.k) if p.k else math.inf,
+                                   p.gamma, p.contorno)
+        except ValueError as e:
+            self.label_solver.setText(f"Sin simulación: {e} (v = ω/k)")
+            return
+        self.label_solver.setText("")
+        if self.combo_inicial.currentIndex() == 0:
+            # Pulso en reposo a un cuarto de la cuerda, de ancho λ/4
+            u0 = pulso(self.x, self.longitud / 4, np.pi / (2 * abs(p.k)), p.E0)
+        else:
+            # El modo de la cuerda más cercano a k
+            n = max(1, round(abs(p.k) * self.longitud / np.pi))
+            u0 = p.E0 * modo_propio(self.x, n, p.contorno)[0]
+        solver.iniciar(u0)
+        self.solver = solver
+        self.plot_numerico.setYRange(-1.2 * abs(p.E0), 1.2 * abs(p.E0))
+
+    def actualizar_numerico(self, avance):
+        p = self.parametros.valores
+        if self._solver_clave != (p.E0, p.k, p.w, len(self.x)):
+            self.reiniciar_solver()
+        if self.solver is None:
+            return
+        self.solver.avanzar(avance, max(1, self.MAX_CELDAS_FRAME // len(self.x)))
+        self.perfil.marca(CALCULO)
+        self.curve_numerico.setData(self.x, self.solver.u)
+        self.perfil.marca(DATOS)
+
+    # =====================
+    # Perfil
+    # =====================
+    def mostrar_hud(self, visible):
+        self.hud.setVisible(visible)
+        if visible:
+            self.hud.setText("Midiendo...")
+            self.colocar_hud()
+            self.hud.raise_()
+
+    def colocar_hud(self):
+        self.hud.adjustSize()
+        self.hud.move(self.width() - self.hud.width() - 10, 10)
+
+    def actualizar_hud(self):
+        # Unas dos veces por segundo, como el resumen de audio
+        ahora = time.perf_counter()
+        if ahora - self._ultimo_hud < 0.5:
+            return
+        self._ultimo_hud = ahora
+        frames = min(self.FRAMES_HUD, self.perfil.n - self._hud_desde)
+        self.hud.setText(f"{self.modo}, malla {len(self.x)}\n"
+                         + self.perfil.resumen(max(frames, 1)))
+        self.colocar_hud()
+
+    def grabar_traza(self):
+        if self.perfil.grabando:
+            # Segundo clic: se para y se guarda lo grabado
+            self.traza_terminada(self.perfil.terminar_grabacion())
+            return
+        try:
+            frames = int(self.input_frames_traza.text())
+            if not 0 < frames <= self.perfil.capacidad:
+                raise ValueError
+            self.input_frames_traza.setStyleSheet("")
+        except ValueError:
+            self.input_frames_traza.setStyleSheet("border: 1px solid red;")
+            return
+        ruta, _ = QFileDialog.getSaveFileName(self, "Grabar traza", f"traza_{self.modo}.json",
+                                              "Traza de Chrome (*.json)")
+        if not ruta:
+            return
+        self.perfil.grabar(ruta, frames, self.check_cprofile.isChecked(),
+                           {"modo": self.modo, "malla": len(self.x), "fps": planificador().fps})
+        self.btn_traza.setText("Parar traza")
+
+    def traza_terminada(self, rutas):
+        self.btn_traza.setText("Grabar traza")
+        if rutas:
+            QMessageBox.information(self, "Grabar traza", "Guardado en:\n" + "\n".join(rutas))
+
+    def k_max(self):
+        return k_max_modo(self.modo, self.parametros.valores)
+
+    def exportar_animacion(self):
+        # Exporta SEGUNDOS_EXPORTAR s del modo actual sin pasar por la pantalla
+        ruta, _ = QFileDialog.getSaveFileName(
+            self, "Exportar animación", f"onda_{self.modo}.mp4",
+            "Vídeo MP4 (*.mp4);;GIF (*.gif);;Secuencia PNG (*.png);;Datos NumPy (*.npz)")
+        if not ruta:
+            return
+        import exportar
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            r = exportar.exportar(ruta, self.modo, self.parametros.valores,
+                                  self.SEGUNDOS_EXPORTAR, planificador().fps)
+        except (ValueError, RuntimeError, OSError) as e:
+            QApplication.restoreOverrideCursor()
+            QMessageBox.warning(self, "Exportar animación", str(e))
+            return
+        QApplication.restoreOverrideCursor()
+        QMessageBox.information(self, "Exportar animación",
+                                f"{r['frames']} frames en {r['tiempo_s']:.1f} s")
+
+    def fijar_malla(self, n=None):
+        self.malla_fija = n
+        self.ajustar_malla()
+
+    def ajustar_malla(self):
+        if self.malla_fija is not None:
+            n = self.malla_fija
+        else:
+            grafico = self.graficos_modo[self.modo]
+            ancho = max(1, int(grafico.width() * grafico.devicePixelRatioF()))
+            n = tamano_malla(ancho, self.k_max(), self.longitud)
+        if n != len(self.x):
+            self.x = np.linspace(0, self.longitud, n)
+            self.motor.set_malla(self.x)
+            self._bloque_clave = None
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.colocar_hud()
+
+    def eventFilter(self, obj, event):
+        # El gráfico del modo cambia de tamaño con la ventana, al mostrarse
+        # al cambiar de modo y al aparecer o desaparecer otros paneles
+        if event.type() == QEvent.Resize and obj is self.graficos_modo.get(self.modo):
+            self.ajustar_malla()
+        return False
+
+    def calcular_bloque(self):
+        t = self.motor.tiempos(self.t, self.dt, self.motor.frames_por_bloque(self.frames_bloque))
+        bloque = self.motor.bloque_modo(self.modo, self.parametros.valores, t, self.px)
+        if self.modo == "fourier":
+            omitidas = self.motor.componentes_omitidas
+            self.label_omitidas.setText(f"({omitidas} de menor amplitud omitidas)" if omitidas else "")
+        return bloque
+
+    def siguiente_frame(self):
+        # Frame del bloque más cercano a self.t; si el reloj se ha saltado
+        # el bloque (o ha vuelto atrás) se calcula otro desde self.t
+        clave = (self.modo, self.parametros.version)
+        i = -1
+        if clave == self._bloque_clave:
+            i = round((self.t - self._bloque_t0) / self.dt)
+        if not 0 <= i < len(self._bloque[0]):
+            self._bloque = self.calcular_bloque()
+            self._bloque_clave = clave
+            self._bloque_t0 = self.t
+            i = 0
+        return self._bloque_t0 + i * self.dt, [datos[i] for datos in self._bloque]
+
+    def actualizar(self, segundos=None):
+        # segundos: tiempo real desde el frame anterior, según el
+        # planificador; sin él se avanza exactamente un frame
+        perfil = self.perfil
+        perfil.inicio()
+        avance = self.dt if segundos is None else segundos * self.velocidad
+        self.t += avance
+        perfil.marca(PARAMETROS)
+        if self.modo == "campo":
+            self.actualizar_campo()
+        elif self.modo == "numerico":
+            self.actualizar_numerico(avance)
+        else:
+            self.actualizar_frame()
+        if self.hud.isVisible() or perfil.grabando:
+            # Con el perfil activo se despachan aquí las actualizaciones de
+            # escena que pyqtgraph deja en cola y se repinta ya su gráfico
+            # visible, para que su dibujo cuente en la etapa (el de
+            # matplotlib ya es síncrono); si no ocurriría después, en el
+            # bucle de eventos
+            QApplication.sendPostedEvents(None, QEvent.MetaCall)
+            for plot in self.plots_pg:
+                if plot.isVisible():
+                    plot.viewport().repaint()
+            perfil.marca(DIBUJO)
+        grabando = perfil.grabando
+        perfil.fin()
+        if grabando and not perfil.grabando:
+            self.traza_terminada(perfil.ultima_grabacion)
+        if self.hud.isVisible():
+            self.actualizar_hud()
+
+    def actualizar_frame(self):
+        # Modos del motor de bloques
+        perfil = self.perfil
         x = self.x
+        t, frame = self.siguiente_frame()
+        perfil.marca(CALCULO)
 
         if self.modo == "simple":
-            y1 = self.E0 * np.sin(self.k * x - self.w * t + self.phi)
+            y1, = frame
             self.curve_simple.setData(x, y1)
-            self.t += 0.1
+            perfil.marca(DATOS)
 
         elif self.modo == "super":
-            y1 = self.E0 * np.sin(self.k * x - self.w * t + self.phi)
-            y2 = self.E1 * np.sin(self.k1 * x - self.w1 * t + self.phi1)
-            self.mpl_super.update_plot(x, y1, y2)
-            self.t += 0.1
+            y1, y2, y_sum = frame
+            self.mpl_super.update_plot(x, y1, y2, y_sum)
+            perfil.marca(DIBUJO)
 
         elif self.modo == "est":
-            y_est = 2 * self.E0 * np.cos(self.k * x) * np.sin(self.w * t)
-            y_particula = 2 * self.E0 * np.cos(self.k * self.px) * np.sin(self.w * t)
+            y_est, y_particula = frame
             self.curve_est.setData(x, y_est)
+            perfil.marca(DATOS)
             self.mpl_est.update_plot(t, y_particula)
-            self.t += 0.1
+            perfil.marca(DIBUJO)
+            self.mover_particulas(t)
+
+        elif self.modo == "fourier":
+            y, = frame
+            self.curve_fourier.setData(x, y)
+            perfil.marca(DATOS)
 
 # =======================
 # Audio y Calculadora (sin cambios)
 # =======================
 
 class VisualAudio(QWidget):
+    SAMPLERATE = 44100
+    BLOCKSIZE = 1024
+    SEGUNDOS_HISTORIA = 4
+    # Filtro adaptativo y estimación de la ruta altavoz -> micrófono
+    # (ganancia 1 con la latencia de dos bloques de la tarjeta, uno en
+    # baja latencia)
+    LONGITUD_FILTRO = 128
+    RUTA_SECUNDARIA = (1.0,)
+    BLOQUES_RETARDO_SECUNDARIO = 2
+    # Origen del audio; los simulados no necesitan tarjeta de sonido
+    FUENTES = ("Micrófono", "Tono simulado", "WAV simulado")
+    FRECUENCIAS = (44100, 48000)
+    BLOQUES = (1024, 512, 256, 128, 64)
+    # Con bloques de este tamaño o menores se pide a la tarjeta su
+    # latencia más baja
+    BLOQUE_BAJA_LATENCIA = 128
+    # Sala de las fuentes simuladas: el micrófono oye el altavoz atenuado
+    # con la latencia del stream (con ganancia 1 la inversión se realimenta)
+    ECO_SIMULADO = (0.8,)
+
     def __init__(self):
         super().__init__()
         layout = QVBoxLayout()
@@ -246,41 +869,314 @@ class VisualAudio(QWidget):
         self.curve_sum = self.plot_sum.plot(pen='m')
         self.btn_toggle = QPushButton("Activar Microfono Cancelación de audio")
         self.btn_toggle.clicked.connect(self.toggle_stream)
+        self.btn_modo = QPushButton("Modo: Inversión")
+        self.btn_modo.clicked.connect(self.cambiar_modo)
+        self.btn_vista = QPushButton("Ver espectro")
+        self.btn_vista.clicked.connect(self.cambiar_vista)
+
+        # Espectro y espectrograma del original y del residual
+        self.vista_espectro = False
+        self.panel_espectro = pg.GraphicsLayoutWidget()
+        self.plot_espectro = self.panel_espectro.addPlot(row=0, col=0, colspan=2, title="Espectro")
+        self.plot_espectro.setLabel('bottom', "Frecuencia", units="Hz")
+        self.plot_espectro.setLabel('left', "dB")
+        self.plot_espectro.setYRange(-100, 0)
+        self.plot_espectro.addLegend()
+        self.curve_espectro_orig = self.plot_espectro.plot(pen='y', name="Original")
+        self.curve_espectro_res = self.plot_espectro.plot(pen='m', name="Residual")
+        self.imagenes_espectro = []
+        for col, titulo in enumerate(["Espectrograma original", "Espectrograma residual"]):
+            plot = self.panel_espectro.addPlot(row=1, col=col, title=titulo)
+            plot.setLabel('bottom', "Tiempo", units="s")
+            plot.setLabel('left', "Frecuencia", units="Hz")
+            imagen = pg.ImageItem()
+            imagen.setColorMap(pg.colormap.get("viridis"))
+            plot.addItem(imagen)
+            self.imagenes_espectro.append(imagen)
+        self.panel_espectro.hide()
+
+        # Longitud de la ventana mostrada, leída del historial de audio
+        ventana_layout = QHBoxLayout()
+        ventana_layout.addWidget(QLabel("Ventana (ms)"))
+        self.input_ventana = QLineEdit("100")
+        self.input_ventana.editingFinished.connect(self.set_ventana)
+        ventana_layout.addWidget(self.input_ventana)
+
         layout.addWidget(self.plot_orig)
         layout.addWidget(self.plot_inv)
+        # Fuente y formato del stream; se aplican al activarlo
+        stream_layout = QHBoxLayout()
+        self.combo_fuente = QComboBox()
+        self.combo_fuente.addItems(self.FUENTES)
+        self.combo_fs = QComboBox()
+        self.combo_fs.addItems([str(fs) for fs in self.FRECUENCIAS])
+        self.combo_bloque = QComboBox()
+        self.combo_bloque.addItems([
+            f"{b} (baja latencia)" if b <= self.BLOQUE_BAJA_LATENCIA else str(b)
+            for b in self.BLOQUES])
+        self.combo_salidas = QComboBox()
+        self.combo_salidas.addItems(["1", "2"])
+        self.ruta_wav = None
+        for etiqueta, combo in [("Fuente", self.combo_fuente), ("Hz", self.combo_fs),
+                                ("Bloque", self.combo_bloque), ("Salidas", self.combo_salidas)]:
+            stream_layout.addWidget(QLabel(etiqueta))
+            stream_layout.addWidget(combo, 1)
+
         layout.addWidget(self.plot_sum)
+        layout.addWidget(self.panel_espectro)
+        layout.addLayout(stream_layout)
+        layout.addLayout(ventana_layout)
+        layout.addWidget(self.btn_modo)
+        layout.addWidget(self.btn_vista)
         layout.addWidget(self.btn_toggle)
+
+        # Calidad de la cancelación: atenuación global y por bandas
+        self.label_medidor = QLabel("Sin datos de cancelación")
+        self.label_medidor.setStyleSheet("font-size: 12px; font-weight: normal; margin: 0px;")
+        layout.addWidget(self.label_medidor)
+
+        # Telemetría del callback: tiempos, latencia y xruns
+        telemetria_layout = QHBoxLayout()
+        self.label_telemetria = QLabel("Sin datos de audio")
+        self.label_telemetria.setStyleSheet("font-size: 12px; font-weight: normal; margin: 0px;")
+        self.btn_exportar = QPushButton("Exportar telemetría")
+        self.btn_exportar.clicked.connect(self.exportar_telemetria)
+        telemetria_layout.addWidget(self.label_telemetria, 1)
+        telemetria_layout.addWidget(self.btn_exportar)
+        layout.addLayout(telemetria_layout)
+
+        # Grabación de la sesión: entrada, antirruido y residual a disco
+        grabacion_layout = QHBoxLayout()
+        self.label_grabacion = QLabel("Sin grabar")
+        self.label_grabacion.setStyleSheet("font-size: 12px; font-weight: normal; margin: 0px;")
+        self.combo_formato_grabacion = QComboBox()
+        self.combo_formato_grabacion.addItems(FORMATOS_GRABACION)
+        self.btn_grabar = QPushButton("Grabar sesión")
+        self.btn_grabar.clicked.connect(self.toggle_grabacion)
+        grabacion_layout.addWidget(self.label_grabacion, 1)
+        grabacion_layout.addWidget(self.combo_formato_grabacion)
+        grabacion_layout.addWidget(self.btn_grabar)
+        layout.addLayout(grabacion_layout)
         self.setLayout(layout)
+        self.grabadora = None
+        # Al salir con una grabación en marcha se cierra el archivo
+        QApplication.instance().aboutToQuit.connect(self.detener_grabacion)
         self.running = False
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_plot)
+        self._ultimo_resumen = 0.0
+        self.modo = "inversion"
+        self.configurar(self.SAMPLERATE, self.BLOCKSIZE)
+
+    def configurar(self, samplerate, blocksize, salidas=1, ruta_secundaria=RUTA_SECUNDARIA):
+        # Reserva todo lo que usa el callback para esta frecuencia y bloque;
+        # sólo debe llamarse con el stream parado
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.ruta_secundaria = tuple(ruta_secundaria)
+        # Un micrófono de entrada; la antiseñal sale igual por cada salida
+        self.salidas = salidas
+        # Historial compartido con el hilo de audio: original, invertido, suma
+        self.anillo = AnilloAudio(self.SEGUNDOS_HISTORIA * samplerate, canales=3)
+        self._suma = np.zeros(blocksize, dtype=np.float32)
+        self.telemetria = TelemetriaAudio(samplerate, blocksize)
+        self.medidor = MedidorCancelacion(samplerate)
+        bloques_retardo = 1 if blocksize <= self.BLOQUE_BAJA_LATENCIA else self.BLOQUES_RETARDO_SECUNDARIO
+        self.control = ControlRealimentado(
+            self.LONGITUD_FILTRO, blocksize, ruta_secundaria=ruta_secundaria,
+            retardo_secundario=bloques_retardo * blocksize)
+        # Canales 0 y 2 del anillo: original y residual
+        self.espectrograma = Espectrograma(samplerate, canales=2)
+        self._pos_espectro = 0
+        segundos = self.espectrograma.segundos()
+        for canal, imagen in enumerate(self.imagenes_espectro):
+            imagen.setImage(self.espectrograma.imagen(canal), autoLevels=False, levels=(-100, 0))
+            imagen.setRect(QRectF(-segundos, 0, segundos, samplerate / 2))
+        self.set_ventana()
+
+    def cambiar_modo(self):
+        # La atenuación se mide desde cero con cada modo
+        self.medidor.pedir_reinicio()
+        if self.modo == "inversion":
+            self.control.filtro.reiniciar()
+            self.modo = "fxlms"
+            self.btn_modo.setText("Modo: FxLMS adaptativo")
+        else:
+            self.modo = "inversion"
+            self.btn_modo.setText("Modo: Inversión")
+
+    def cambiar_vista(self):
+        self.vista_espectro = not self.vista_espectro
+        for plot in [self.plot_orig, self.plot_inv, self.plot_sum]:
+            plot.setVisible(not self.vista_espectro)
+        self.panel_espectro.setVisible(self.vista_espectro)
+        self.btn_vista.setText("Ver señal" if self.vista_espectro else "Ver espectro")
+        if self.vista_espectro:
+            # El espectrograma empieza con el audio que llegue a partir de ahora
+            self.espectrograma.reiniciar()
+            self._pos_espectro = self.anillo.escrito
+
+    def set_ventana(self):
+        try:
+            ms = float(self.input_ventana.text())
+        except ValueError:
+            return
+        muestras = int(ms * self.samplerate / 1000)
+        self.muestras_ventana = max(1, min(muestras, self.anillo.capacidad - self.blocksize))
+
+    def abrir_stream(self):
+        # Stream de la fuente elegida, o None si se cancela la elección del WAV
+        fs = self.FRECUENCIAS[self.combo_fs.currentIndex()]
+        bloque = self.BLOQUES[self.combo_bloque.currentIndex()]
+        salidas = int(self.combo_salidas.currentText())
+        fuente = self.combo_fuente.currentText()
+        # La sala de las fuentes simuladas se conoce exactamente; con el
+        # micrófono la ruta secundaria es una estimación
+        ruta = self.RUTA_SECUNDARIA if fuente == "Micrófono" else self.ECO_SIMULADO
+        if (fs, bloque, salidas, ruta) != (self.samplerate, self.blocksize, self.salidas,
+                                           self.ruta_secundaria):
+            self.configurar(fs, bloque, salidas, ruta)
+        latencia = "low" if bloque <= self.BLOQUE_BAJA_LATENCIA else "high"
+        canales = (1, salidas)
+
+        if fuente == "Micrófono":
+            return backend_audio.abrir_stream("sounddevice", fs, bloque, canales,
+                                              self.callback, latencia)
+        if fuente == "Tono simulado":
+            # Dos tonos y algo de ruido, para ver qué bandas se cancelan
+            origen = backend_audio.tono(fs, bloque, frecuencias=(220.0, 1500.0), ruido=0.05)
+        else:
+            ruta, _ = QFileDialog.getOpenFileName(self, "Audio simulado", self.ruta_wav or "",
+                                                  "WAV (*.wav)")
+            if not ruta:
+                return None
+            self.ruta_wav = ruta
+            origen = backend_audio.wav(ruta, bloque)
+        return backend_audio.abrir_stream("simulado", fs, bloque, canales, self.callback,
+                                          latencia, fuente=origen, eco=self.ECO_SIMULADO)
 
     def toggle_stream(self):
         if self.running:
             self.stream.stop(); self.stream.close()
             self.running = False
-            self.timer.stop()
+            planificador().quitar(self)
             self.btn_toggle.setText("Activar")
         else:
-            self.audio_in = np.zeros(1024)
-            self.audio_inv = np.zeros(1024)
-            self.audio_sum = np.zeros(1024)
-            self.stream = sd.Stream(channels=1, callback=self.callback, samplerate=44100, blocksize=1024)
-            self.stream.start()
+            # Sin PortAudio o con el dispositivo ocupado el stream no se
+            # abre; el botón se queda como estaba
+            try:
+                stream = self.abrir_stream()
+                if stream is None:
+                    return
+                self.telemetria.reiniciar()
+                self.medidor.reiniciar()
+                backend_audio.arrancar(stream)
+            except (ValueError, OSError) as e:
+                QMessageBox.warning(self, "Audio", str(e))
+                return
+            self.stream = stream
             self.running = True
-            self.timer.start(30)
+            planificador().registrar(self, self.update_plot)
             self.btn_toggle.setText("Desactivar")
+        self.bloquear_combos()
+
+    def bloquear_combos(self):
+        for combo in [self.combo_fuente, self.combo_fs, self.combo_bloque, self.combo_salidas]:
+            combo.setEnabled(not self.running)
+        # La grabación se abre con una frecuencia fija
+        self.combo_fs.setEnabled(not self.running and self.grabadora is None)
+        self.combo_formato_grabacion.setEnabled(self.grabadora is None)
+
+    def toggle_grabacion(self):
+        if self.grabadora is not None:
+            self.detener_grabacion()
+            return
+        formato = self.combo_formato_grabacion.currentText()
+        ruta, _ = QFileDialog.getSaveFileName(self, "Grabar sesión", f"sesion.{formato}",
+                                              f"{formato.upper()} (*.{formato})")
+        if not ruta:
+            return
+        # Con el stream parado, la frecuencia con la que se va a abrir
+        fs = self.samplerate if self.running else self.FRECUENCIAS[self.combo_fs.currentIndex()]
+        grabadora = GrabadoraSesion(ruta, fs, formato=formato)
+        try:
+            grabadora.iniciar()
+        except OSError as e:
+            QMessageBox.warning(self, "Grabar sesión", str(e))
+            return
+        self.grabadora = grabadora
+        self.label_grabacion.setText(grabadora.resumen())
+        self.btn_grabar.setText("Detener grabación")
+        self.bloquear_combos()
+
+    def detener_grabacion(self):
+        grabadora = self.grabadora
+        if grabadora is None:
+            return
+        # El callback deja de ver la grabadora antes de vaciar la cola
+        self.grabadora = None
+        grabadora.detener()
+        self.label_grabacion.setText(grabadora.resumen())
+        self.btn_grabar.setText("Grabar sesión")
+        self.bloquear_combos()
 
     def callback(self, indata, outdata, frames, time, status):
-        self.audio_in = indata[:, 0]
-        self.audio_inv = -self.audio_in
-        self.audio_sum = self.audio_in + self.audio_inv
-        outdata[:, 0] = self.audio_inv
-
-    def update_plot(self):
-        self.curve_orig.setData(self.audio_in)
-        self.curve_inv.setData(self.audio_inv)
-        self.curve_sum.setData(self.audio_sum)
+        # Hilo de audio (PortAudio o simulado): sólo escrituras en buffers
+        # preasignados
+        t0 = self.telemetria.inicio()
+        entrada = indata[:, 0]
+        salida = outdata[:, 0]
+        if self.modo == "fxlms":
+            self.control.procesar(entrada, salida)
+        else:
+            self.control.invertir(entrada, salida)
+        if outdata.shape[1] > 1:
+            outdata[:, 1:] = outdata[:, :1]
+        suma = self._suma[:frames]
+        np.add(entrada, salida, out=suma)
+        self.anillo.escribir(0, entrada)
+        self.anillo.escribir(1, salida)
+        self.anillo.escribir(2, suma)
+        self.anillo.publicar(frames)
+        # El micrófono ya oye el residual; lo que habría oído sin el
+        # altavoz se reconstruye con el modelo de la ruta secundaria
+        self.medidor.agregar(self.control.referencia(frames), entrada)
+        grabadora = self.grabadora
+        if grabadora is not None:
+            grabadora.agregar(entrada, salida, suma)
+        self.telemetria.fin(t0, time, status)
+
+    def update_plot(self, segundos=None):
+        if self.vista_espectro:
+            self.actualizar_espectro()
+        else:
+            audio_in, audio_inv, audio_sum = self.anillo.leer(self.muestras_ventana)
+            self.curve_orig.setData(audio_in)
+            self.curve_inv.setData(audio_inv)
+            self.curve_sum.setData(audio_sum)
+        # El resumen se recalcula unas tres veces por segundo
+        ahora = time.perf_counter()
+        if ahora - self._ultimo_resumen > 0.3:
+            self._ultimo_resumen = ahora
+            self.label_telemetria.setText(self.telemetria.resumen())
+            self.label_medidor.setText(self.medidor.resumen())
+            if self.grabadora is not None:
+                self.label_grabacion.setText(self.grabadora.resumen())
+
+    def actualizar_espectro(self):
+        # Sólo las muestras publicadas desde el último frame
+        datos, self._pos_espectro = self.anillo.leer_desde(self._pos_espectro)
+        if self.espectrograma.agregar(datos[0::2]) == 0:
+            return
+        frecuencias = self.espectrograma.frecuencias
+        self.curve_espectro_orig.setData(frecuencias, self.espectrograma.espectro(0))
+        self.curve_espectro_res.setData(frecuencias, self.espectrograma.espectro(1))
+        for canal, imagen in enumerate(self.imagenes_espectro):
+            imagen.setImage(self.espectrograma.imagen(canal), autoLevels=False)
+
+    def exportar_telemetria(self):
+        ruta, _ = QFileDialog.getSaveFileName(self, "Exportar telemetría", "telemetria_audio.json",
+                                              "JSON (*.json);;CSV (*.csv)")
+        if ruta:
+            self.telemetria.exportar(ruta)
 
 class CalculadoraOndas(QWidget):
     def __init__(self):
@@ -288,8 +1184,7 @@ class CalculadoraOndas(QWidget):
         layout = QGridLayout()
 
         self.inputs = {}
-        campos = ["Frecuencia (f)", "Longitud de onda (λ)", "Velocidad (v)", "Número de onda (k)", "Pulsación angular (ω)"]
-        for i, campo in enumerate(campos):
+        for i, campo in enumerate(ETIQUETAS.values()):
             layout.addWidget(QLabel(campo + ":"), i, 0)
             self.inputs[campo] = QLineEdit()
             layout.addWidget(self.inputs[campo], i, 1)
@@ -298,41 +1193,30 @@ class CalculadoraOndas(QWidget):
         btn = QPushButton("Calcular valores restantes")
         btn.clicked.connect(self.calcular)
 
-        layout.addWidget(btn, len(campos), 0, 1, 2)
-        layout.addWidget(self.resultado, len(campos) + 1, 0, 1, 2)
+        layout.addWidget(btn, len(ETIQUETAS), 0, 1, 2)
+        layout.addWidget(self.resultado, len(ETIQUETAS) + 1, 0, 1, 2)
 
         self.setLayout(layout)
 
     def calcular(self):
+        # Una fila del mismo cálculo por columnas que `python calculadora.py`
         try:
-            vals = {}
-            for campo, entrada in self.inputs.items():
-                texto = entrada.text().strip()
-                if texto != "":
-                    vals[campo] = float(texto)
-
-            # Relaciones entre parámetros:
-            # v = f * λ
-            # k = 2π / λ
-            # ω = 2π * f
-
-            if "Frecuencia (f)" in vals and "Longitud de onda (λ)" in vals:
-                vals["Velocidad (v)"] = vals["Frecuencia (f)"] * vals["Longitud de onda (λ)"]
-            if "Velocidad (v)" in vals and "Frecuencia (f)" in vals and "Longitud de onda (λ)" not in vals:
-                vals["Longitud de onda (λ)"] = vals["Velocidad (v)"] / vals["Frecuencia (f)"]
-            if "Velocidad (v)" in vals and "Longitud de onda (λ)" in vals and "Frecuencia (f)" not in vals:
-                vals["Frecuencia (f)"] = vals["Velocidad (v)"] / vals["Longitud de onda (λ)"]
-
-            if "Longitud de onda (λ)" in vals:
-                vals["Número de onda (k)"] = 2 * np.pi / vals["Longitud de onda (λ)"]
-            if "Frecuencia (f)" in vals:
-                vals["Pulsación angular (ω)"] = 2 * np.pi * vals["Frecuencia (f)"]
-
-            # Mostrar resultados
-            texto = "\n".join([f"{clave}: {valor:.3f}" for clave, valor in vals.items()])
-            self.resultado.setText("Resultado:\n" + texto)
-        except:
+            datos = {}
+            for nombre, etiqueta in ETIQUETAS.items():
+                texto = self.inputs[etiqueta].text().strip()
+                datos[nombre] = [float(texto) if texto != "" else np.nan]
+        except ValueError:
             self.resultado.setText("Error en los datos")
+            return
+        r = resolver(datos)
+
+        lineas = [f"{etiqueta}: {r[nombre][0]:.3f}"
+                  for nombre, etiqueta in ETIQUETAS.items() if np.isfinite(r[nombre][0])]
+        if r["inconsistente"][0]:
+            lineas.append("Los datos no cumplen v = fλ, k = 2π/λ, ω = 2πf")
+        elif r["indeterminado"][0]:
+            lineas.append("Faltan datos para calcular el resto")
+        self.resultado.setText("\n".join(["Resultado:"] + lineas))
 
 
 # =======================
@@ -422,26 +1306,131 @@ class VentanaPrincipal(QWidget):
         widget.setLayout(layout)
         return widget
 
+    # (atributo, título, clase) de cada pestaña, en orden
+    TABS = [
+        ("simulador", "🌊 Simulador de Ondas", SimuladorOndas),
+        ("calculadora", "📊 Calculadora", CalculadoraOndas),
+        ("audio", "🎧 Audio en Tiempo Real", VisualAudio),
+    ]
+
     def crear_tabs(self):
+        # Cada pestaña empieza vacía y se construye la primera vez que se
+        # selecciona
         tabs = QTabWidget()
-
-        self.simulador = SimuladorOndas()
-        self.calculadora = CalculadoraOndas()
-        self.audio = VisualAudio()
-
-        tabs.addTab(self.simulador, "🌊 Simulador de Ondas")
-        tabs.addTab(self.calculadora, "📊 Calculadora")
-        tabs.addTab(self.audio, "🎧 Audio en Tiempo Real")
-
+        for atributo, titulo, _ in self.TABS:
+            setattr(self, atributo, None)
+            tabs.addTab(QWidget(), titulo)
+        tabs.currentChanged.connect(self.construir_tab)
         return tabs
 
+    def construir_tab(self, index):
+        atributo, titulo, clase = self.TABS[index]
+        if getattr(self, atributo) is not None:
+            return
+        widget = clase()
+        setattr(self, atributo, widget)
+        self.tabs_widget.blockSignals(True)
+        self.tabs_widget.removeTab(index)
+        self.tabs_widget.insertTab(index, widget, titulo)
+        self.tabs_widget.setCurrentIndex(index)
+        self.tabs_widget.blockSignals(False)
+
     def mostrar_tabs(self, index):
         self.menu_widget.hide()
         self.tabs_widget.show()
+        self.construir_tab(index)
         self.tabs_widget.setCurrentIndex(index)
 
+
+# =======================
+# Medición del arranque
+# =======================
+class MedidorArranque(QObject):
+    # Modo --medir-arranque [pestaña]: informa del tiempo de importación,
+    # de construcción de la ventana y hasta el primer pintado (desde que
+    # empieza a ejecutarse este módulo, sin contar el arranque de Python).
+    # Con una pestaña, la abre después y mide también lo que cuesta.
+    def __init__(self, ventana, tab=None):
+        super().__init__()
+        self.ventana = ventana
+        self.tab = tab
+        self.marcas = {"importacion": _T_IMPORTADO - _T_INICIO}
+        self._esperando = ventana
+        ventana.installEventFilter(self)
+
+    def ventana_creada(self):
+        self.marcas["ventana_creada"] = time.perf_counter() - _T_INICIO
+
+    def eventFilter(self, obj, event):
+        if obj is self._esperando and event.type() == QEvent.Paint:
+            obj.removeEventFilter(self)
+            self._esperando = None
+            QTimer.singleShot(0, self.pintado)
+        return False
+
+    def pintado(self):
+        ahora = time.perf_counter()
+        if "primer_pintado" not in self.marcas:
+            self.marcas["primer_pintado"] = ahora - _T_INICIO
+            if self.tab is not None:
+                self._t_tab = ahora
+                self.ventana.mostrar_tabs(self.tab)
+                self.marcas["construir_pestaña"] = time.perf_counter() - ahora
+                self._esperando = self.ventana.tabs_widget.currentWidget()
+                self._esperando.installEventFilter(self)
+                return
+        else:
+            self.marcas["pintado_pestaña"] = ahora - self._t_tab
+        self.informar()
+        QApplication.quit()
+
+    def informar(self):
+        for nombre, segundos in self.marcas.items():
+            print(f"{nombre:20s} {1000 * segundos:8.1f} ms")
+        for modulo, segundos in TIEMPOS_IMPORTACION.items():
+            print(f"  import {modulo:13s} {1000 * segundos:8.1f} ms")
+
+def fps_positivo(texto):
+    fps = float(texto)
+    if not (math.isfinite(fps) and fps > 0):
+        raise argparse.ArgumentTypeError(f"los fps deben ser un número positivo: {texto}")
+    return fps
+
+
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
+    # python oladefinitivo.py procesar-wav entrada.wav --residual res.wav
+    if len(sys.argv) > 1 and sys.argv[1] == "procesar-wav":
+        import audio_offline
+        sys.exit(audio_offline.main(sys.argv[2:]))
+
+    # python oladefinitivo.py calcular medidas.csv resultado.csv
+    if len(sys.argv) > 1 and sys.argv[1] == "calcular":
+        import calculadora
+        sys.exit(calculadora.main(sys.argv[2:]))
+
+    # python oladefinitivo.py exportar clase.mp4 --modo super --segundos 60
+    if len(sys.argv) > 1 and sys.argv[1] == "exportar":
+        import exportar
+        sys.exit(exportar.main(sys.argv[2:]))
+
+    # python oladefinitivo.py --fps 30 --medir-arranque [índice de pestaña]
+    # Las opciones que no son de aquí (-style, ...) pasan a Qt
+    parser = argparse.ArgumentParser(
+        description="Simulador de ondas y cancelación de ruido. Subcomandos: "
+                    "procesar-wav, calcular y exportar (cada uno con su --help).")
+    parser.add_argument("--fps", type=fps_positivo, help=f"frames por segundo (por defecto {PlanificadorFrames.FPS})")
+    parser.add_argument("--medir-arranque", nargs="?", type=int, const=-1, metavar="PESTAÑA",
+                        help="mide el arranque y, con un índice, el primer pintado de esa pestaña")
+    args, resto = parser.parse_known_args()
+    medir = args.medir_arranque is not None
+    tab = args.medir_arranque if medir and args.medir_arranque >= 0 else None
+
+    app = QApplication(sys.argv[:1] + resto)
+    if args.fps is not None:
+        planificador().set_fps(args.fps)
     ventana = VentanaPrincipal()
+    if medir:
+        medidor = MedidorArranque(ventana, tab)
+        medidor.ventana_creada()
     ventana.show()
     sys.exit(app.exec_())
\ No newline at end of file
@@ -0,0 +1,88 @@
+# Modelo de parámetros de la simulación, independiente de Qt.
+# Los campos de texto sólo se interpretan cuando el usuario termina de
+# editarlos; el modelo valida, guarda un registro inmutable y aumenta
+# `version` en cada cambio real, para que las cachés sepan si siguen valiendo.
+
+import math
+from collections import namedtuple
+
+from ecuacion_ondas import CONTORNOS
+from motor_ondas import SERIES
+
+CAMPOS_ONDA = ("E0", "k", "w", "phi", "E1", "k1", "w1", "phi1")
+# contorno y gamma (amortiguamiento) son del modo de ecuación de ondas
+Parametros = namedtuple("Parametros", CAMPOS_ONDA + ("serie", "n_armonicos", "contorno", "gamma"),
+                        defaults=(CONTORNOS[0], 0.0))
+
+# Los números de onda se escriben en múltiplos de pi
+ESCALAS = {"k": math.pi, "k1": math.pi}
+
+# Valores con los que arranca el simulador
+PARAMETROS_INICIALES = Parametros(
+    E0=2.0, k=math.pi, w=5.0, phi=0.5,
+    E1=1.5, k1=1.5 * math.pi, w1=4.0, phi1=math.pi,
+    serie=SERIES[0], n_armonicos=50, contorno=CONTORNOS[0], gamma=0.0)
+
+
+def validar(nombre, valor):
+    if nombre == "serie":
+        if valor not in SERIES:
+            raise ValueError(f"serie desconocida: {valor}")
+        return valor
+    if nombre == "n_armonicos":
+        valor = int(valor)
+        if valor < 1:
+            raise ValueError("hace falta al menos una componente")
+        return valor
+    if nombre == "contorno":
+        if valor not in CONTORNOS:
+            raise ValueError(f"contorno desconocido: {valor}")
+        return valor
+    valor = float(valor)
+    if not math.isfinite(valor):
+        raise ValueError(f"{nombre} debe ser un número finito")
+    if nombre == "gamma" and valor < 0:
+        raise ValueError("el amortiguamiento no puede ser negativo")
+    return valor
+
+
+def interpretar(nombre, texto):
+    texto = texto.strip()
+    if nombre in ("serie", "contorno"):
+        return texto
+    if nombre == "n_armonicos":
+        return int(texto)
+    return float(texto) * ESCALAS.get(nombre, 1)
+
+
+class ModeloParametros:
+    __slots__ = ("valores", "version", "_oyentes")
+
+    def __init__(self, valores):
+        self.valores = Parametros(*(validar(n, v) for n, v in zip(Parametros._fields, valores)))
+        self.version = 0
+        self._oyentes = []
+
+    def conectar(self, funcion):
+        # funcion(valores) se llama tras cada cambio real
+        self._oyentes.append(funcion)
+
+    def cambiar(self, **cambios):
+        nuevos = self.valores._replace(**{n: validar(n, v) for n, v in cambios.items()})
+        if nuevos == self.valores:
+            return False
+        self.valores = nuevos
+        self.version += 1
+        for funcion in self._oyentes:
+            funcion(nuevos)
+        return True
+
+    def desde_texto(self, nombre, texto):
+        # Lanza ValueError si el texto no es válido; el modelo no cambia
+        return self.cambiar(**{nombre: interpretar(nombre, texto)})
+
+    def texto(self, nombre):
+        valor = getattr(self.valores, nombre)
+        if nombre in ESCALAS:
+            valor = valor / ESCALAS[nombre]
+        return str(valor)
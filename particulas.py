@@ -0,0 +1,75 @@
+# Partículas del medio en una onda estacionaria, sin Qt.
+#
+# Cada partícula tiene una posición de reposo (x0, y0) y se desplaza
+# 2*E0*sin(w*t)*cos(k*x0), en transversal (y) o en longitudinal (x). El
+# perfil cos(k*x0) se guarda en la base espacial del motor, así que cada
+# frame es un único producto por un escalar sobre todas las partículas,
+# escrito en arrays preasignados. El rastro opcional guarda los últimos
+# desplazamientos en un buffer circular compartido (historia x partículas);
+# como cada partícula se mueve sobre una recta, su rastro es el segmento
+# entre el menor y el mayor de ellos.
+
+import numpy as np
+
+from buffer_circular import BufferCircular
+from motor_ondas import BaseEspacial
+
+DISPOSICIONES = ("linea", "plano")
+
+
+def reposo(n, longitud, disposicion="linea", alto=1.0, semilla=0):
+    # Posiciones de reposo: n puntos equiespaciados sobre el eje x, o
+    # repartidos al azar en la banda [0, longitud] x [-alto, alto]
+    if disposicion == "linea":
+        return np.linspace(0, longitud, n), np.zeros(n)
+    if disposicion == "plano":
+        rng = np.random.default_rng(semilla)
+        return rng.uniform(0, longitud, n), rng.uniform(-alto, alto, n)
+    raise ValueError(f"disposición desconocida: {disposicion}")
+
+
+class Particulas:
+    def __init__(self, x0, y0=None, historia=0, longitudinal=False):
+        self.x0 = np.asarray(x0, dtype=float)
+        self.y0 = np.zeros_like(self.x0) if y0 is None else np.asarray(y0, dtype=float)
+        self.longitudinal = longitudinal
+        self.base = BaseEspacial(self.x0)
+        # Posiciones actuales; una de las dos coordenadas no cambia
+        self.x = self.x0.copy()
+        self.y = self.y0.copy()
+        self.desplazamiento = np.zeros(len(self.x0))
+        self.rastro = None
+        if historia:
+            self.rastro = BufferCircular(historia, (len(self.x0),))
+            self._trazas = np.empty((2, len(self.x0), 2))
+
+    def __len__(self):
+        return len(self.x0)
+
+    def reiniciar(self):
+        self.x[:] = self.x0
+        self.y[:] = self.y0
+        if self.rastro is not None:
+            self.rastro.limpiar()
+
+    def estacionaria(self, amplitud, k):
+        # amplitud = 2*E0*sin(w*t) en el instante del frame
+        np.multiply(self.base.terminos(k, 0.0)[1], amplitud, out=self.desplazamiento)
+        if self.longitudinal:
+            np.add(self.x0, self.desplazamiento, out=self.x)
+        else:
+            np.add(self.y0, self.desplazamiento, out=self.y)
+        if self.rastro is not None:
+            self.rastro.agregar(self.desplazamiento)
+
+    def trazas(self):
+        # (2, partículas, 2): coordenadas x e y de los extremos del rastro
+        # de cada partícula
+        d = self.rastro.vista()
+        out = self._trazas
+        out[0] = self.x0[:, None]
+        out[1] = self.y0[:, None]
+        mueve = out[0 if self.longitudinal else 1]
+        mueve[:, 0] += d.min(axis=0)
+        mueve[:, 1] += d.max(axis=0)
+        return out
@@ -0,0 +1,66 @@
+# Resolución espacial según el tamaño del gráfico y los números de onda.
+
+import numpy as np
+
+from motor_ondas import serie_fourier
+
+PUNTOS_POR_ONDA = 8
+SOBREMUESTREO = 2
+MALLA_MIN = 64
+MALLA_MAX = 1 << 20
+
+
+def tamano_malla(ancho_px, k_max, longitud, puntos_por_onda=PUNTOS_POR_ONDA,
+                 sobremuestreo=SOBREMUESTREO):
+    # Lo que haga falta para no tener aliasing con el mayor k (al menos
+    # puntos_por_onda muestras por longitud de onda) y para no quedarse
+    # corto respecto a los píxeles. Se redondea a potencia de 2 para que la
+    # malla no cambie con cada pequeño ajuste de la ventana o de k.
+    n_onda = puntos_por_onda * abs(k_max) * longitud / (2 * np.pi)
+    n = max(n_onda, sobremuestreo * ancho_px, MALLA_MIN)
+    n = 1 << int(np.ceil(np.log2(n)))
+    return min(n, MALLA_MAX)
+
+
+class DecimadorMinMax:
+    # Reduce N muestras a dos por columna de píxeles (mínimo y máximo).
+    # Una línea más densa que la pantalla se ve igual, pero se dibujan
+    # 2*columnas puntos en vez de N. Los índices y la x decimada se guardan
+    # mientras no cambien la malla ni el número de columnas.
+    def __init__(self):
+        self._clave = None
+        self.x = None
+
+    def preparar(self, x, columnas):
+        clave = (len(x), x[0], x[-1], columnas)
+        if clave != self._clave:
+            self._clave = clave
+            self._inicios = np.linspace(0, len(x), columnas, endpoint=False).astype(np.intp)
+            self.x = np.repeat(x[self._inicios], 2)
+        return self.x
+
+    def decimar(self, y, out=None):
+        if out is None:
+            out = np.empty(len(self.x))
+        np.minimum.reduceat(y, self._inicios, out=out[0::2])
+        np.maximum.reduceat(y, self._inicios, out=out[1::2])
+        return out
+
+
+def k_visible(k, amplitudes, umbral=0.01):
+    # Mayor k entre las componentes con amplitud de al menos `umbral` veces
+    # la mayor. Las demás sólo añaden un rizado por debajo del píxel, y
+    # resolverlas multiplicaría el tamaño de la malla (p. ej. los armónicos
+    # altos de una serie de Fourier).
+    amplitudes = np.abs(amplitudes)
+    return np.abs(k[amplitudes >= umbral * amplitudes.max()]).max()
+
+
+def k_max_modo(modo, p):
+    # Mayor número de onda que hay que resolver en un modo del simulador
+    if modo == "super":
+        return max(abs(p.k), abs(p.k1))
+    if modo == "fourier":
+        comp = serie_fourier(p.serie, p.n_armonicos, p.E0, p.k, p.w)
+        return k_visible(comp.k, comp.E0)
+    return abs(p.k)
@@ -0,0 +1,238 @@
+# Telemetría del callback de audio (tiempos, latencia y xruns) y perfil
+# por etapas de los frames del simulador. En los dos casos el código medido
+# sólo toma marcas de perf_counter y escribe en arrays preasignados; las
+# estadísticas se calculan desde la interfaz.
+
+import cProfile
+import csv
+import json
+import os
+import time
+
+import numpy as np
+
+# Banderas de sounddevice.CallbackFlags que se cuentan como xruns
+BANDERAS = ("input_underflow", "input_overflow", "output_underflow",
+            "output_overflow", "priming_output")
+
+# Etapas de un frame del simulador, en orden, y sus índices para marca()
+ETAPAS = ("parametros", "calculo", "datos", "dibujo")
+PARAMETROS, CALCULO, DATOS, DIBUJO = range(len(ETAPAS))
+PRESUPUESTO_MS = 30.0
+
+
+def ventana_circular(datos, n):
+    # Copia en orden cronológico de lo guardado en un array circular
+    # (por filas) tras n escrituras
+    capacidad = len(datos)
+    if n < capacidad:
+        return datos[:n].copy()
+    return np.roll(datos, -(n % capacidad), axis=0)
+
+
+def percentiles_ms(datos):
+    p50, p99 = np.percentile(datos, [50, 99])
+    return {"p50": 1000 * p50, "p99": 1000 * p99, "max": 1000 * datos.max()}
+
+
+class TelemetriaAudio:
+    def __init__(self, samplerate, blocksize, capacidad=4096):
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.capacidad = capacidad
+        self.inicios = np.zeros(capacidad)
+        self.duraciones = np.zeros(capacidad)
+        self.latencias = np.zeros(capacidad)
+        self.contadores = dict.fromkeys(BANDERAS, 0)
+        self.n = 0
+
+    def reiniciar(self):
+        self.n = 0
+        for bandera in BANDERAS:
+            self.contadores[bandera] = 0
+
+    # ---- desde el callback ----
+    def inicio(self):
+        return time.perf_counter()
+
+    def fin(self, t0, tiempo, status):
+        i = self.n % self.capacidad
+        self.inicios[i] = t0
+        self.duraciones[i] = time.perf_counter() - t0
+        if tiempo is not None:
+            # Desde que entra la muestra por el ADC hasta que sale por el DAC
+            self.latencias[i] = tiempo.outputBufferDacTime - tiempo.inputBufferAdcTime
+        if status:
+            for bandera in BANDERAS:
+                if getattr(status, bandera, False):
+                    self.contadores[bandera] += 1
+        self.n += 1
+
+    # ---- desde la interfaz ----
+    def _ventana(self, datos):
+        # Copia en orden cronológico de los últimos callbacks guardados
+        return ventana_circular(datos, self.n)
+
+    def estadisticas(self):
+        periodo = self.blocksize / self.samplerate
+        stats = {
+            "callbacks": self.n,
+            "samplerate": self.samplerate,
+            "blocksize": self.blocksize,
+            "periodo_ms": 1000 * periodo,
+            "xruns": dict(self.contadores),
+        }
+        duraciones = self._ventana(self.duraciones)
+        if len(duraciones) == 0:
+            return stats
+        inicios = self._ventana(self.inicios)
+        latencias = self._ventana(self.latencias)
+        for nombre, datos in (("duracion_ms", duraciones), ("latencia_ms", latencias),
+                              ("intervalo_ms", np.diff(inicios))):
+            if len(datos):
+                stats[nombre] = percentiles_ms(datos)
+        stats["carga_p99"] = stats["duracion_ms"]["p99"] / stats["periodo_ms"]
+        return stats
+
+    def resumen(self):
+        s = self.estadisticas()
+        if "duracion_ms" not in s:
+            return "Sin datos de audio"
+        d, lat = s["duracion_ms"], s["latencia_ms"]
+        return (f"callback p50/p99/max: {d['p50']:.2f}/{d['p99']:.2f}/{d['max']:.2f} ms"
+                f" (bloque {s['periodo_ms']:.1f} ms, carga p99 {100 * s['carga_p99']:.0f}%)  |  "
+                f"latencia p50: {lat['p50']:.1f} ms  |  xruns: {sum(s['xruns'].values())}")
+
+    def exportar_json(self, ruta):
+        with open(ruta, "w") as f:
+            json.dump(self.estadisticas(), f, indent=2)
+
+    def exportar_csv(self, ruta):
+        # Una fila por callback de la ventana guardada
+        inicios = self._ventana(self.inicios)
+        duraciones = self._ventana(self.duraciones)
+        latencias = self._ventana(self.latencias)
+        if len(inicios):
+            inicios = inicios - inicios[0]
+        with open(ruta, "w", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(["inicio_s", "duracion_ms", "latencia_ms"])
+            for fila in zip(inicios, 1000 * duraciones, 1000 * latencias):
+                w.writerow([f"{v:.6f}" for v in fila])
+
+    def exportar(self, ruta):
+        if ruta.lower().endswith(".csv"):
+            self.exportar_csv(ruta)
+        else:
+            self.exportar_json(ruta)
+
+
+class PerfilFrames:
+    # Tiempo de cada etapa de los últimos `capacidad` frames. marca(etapa)
+    # suma a la etapa el tiempo desde la marca anterior, así que una etapa
+    # puede marcarse varias veces en un frame.
+    def __init__(self, capacidad=1024):
+        self.capacidad = capacidad
+        self.inicios = np.zeros(capacidad)
+        self.etapas = np.zeros((capacidad, len(ETAPAS)))
+        self.n = 0
+        self._fila = self.etapas[0]
+        self._t = 0.0
+        self._grabacion = None
+        # Rutas escritas por la última grabación terminada
+        self.ultima_grabacion = []
+
+    @property
+    def grabando(self):
+        return self._grabacion is not None
+
+    # ---- desde el código medido ----
+    def inicio(self):
+        i = self.n % self.capacidad
+        self._fila = self.etapas[i]
+        self._fila[:] = 0
+        self._t = self.inicios[i] = time.perf_counter()
+
+    def marca(self, etapa):
+        t = time.perf_counter()
+        self._fila[etapa] += t - self._t
+        self._t = t
+
+    def fin(self):
+        self.n += 1
+        if self._grabacion is not None and self.n >= self._grabacion["fin"]:
+            self.ultima_grabacion = self.terminar_grabacion()
+
+    # ---- estadísticas ----
+    def estadisticas(self, frames=None):
+        # De los últimos `frames` frames (todos los guardados con None)
+        inicios = ventana_circular(self.inicios, self.n)[-frames if frames else None:]
+        etapas = ventana_circular(self.etapas, self.n)[-frames if frames else None:]
+        stats = {"frames": len(inicios), "presupuesto_ms": PRESUPUESTO_MS}
+        if len(inicios) < 2:
+            return stats
+        stats["fps"] = (len(inicios) - 1) / (inicios[-1] - inicios[0])
+        total = etapas.sum(axis=1)
+        for nombre, datos in zip(ETAPAS, etapas.T):
+            stats[nombre] = percentiles_ms(datos)
+        stats["total"] = percentiles_ms(total)
+        stats["sobre_presupuesto"] = int((total > PRESUPUESTO_MS / 1000).sum())
+        return stats
+
+    def resumen(self, frames=None):
+        s = self.estadisticas(frames)
+        if "fps" not in s:
+            return "Sin frames"
+        lineas = [f"{s['fps']:5.1f} fps   p50 / p99 ms"]
+        for nombre in ETAPAS + ("total",):
+            lineas.append(f"{nombre:10s} {s[nombre]['p50']:6.2f} / {s[nombre]['p99']:6.2f}")
+        lineas.append(f"> {PRESUPUESTO_MS:.0f} ms: {s['sobre_presupuesto']} de {s['frames']}")
+        return "\n".join(lineas)
+
+    # ---- traza ----
+    def grabar(self, ruta, frames, cprofile=False, meta=None):
+        # Graba los próximos `frames` frames como traza de Chrome
+        # (chrome://tracing o Perfetto) en `ruta` y, con cprofile, el perfil
+        # de cProfile del mismo intervalo en la misma ruta con extensión .prof
+        if not 0 < frames <= self.capacidad:
+            raise ValueError(f"se pueden grabar entre 1 y {self.capacidad} frames")
+        perfilador = None
+        if cprofile:
+            perfilador = cProfile.Profile()
+            perfilador.enable()
+        self._grabacion = {"ruta": ruta, "inicio": self.n, "fin": self.n + frames,
+                           "perfilador": perfilador, "meta": meta or {}}
+
+    def terminar_grabacion(self):
+        # Escribe lo grabado hasta ahora; devuelve las rutas escritas
+        g, self._grabacion = self._grabacion, None
+        if g is None:
+            return []
+        rutas = [g["ruta"]]
+        if g["perfilador"] is not None:
+            g["perfilador"].disable()
+            rutas.append(os.path.splitext(g["ruta"])[0] + ".prof")
+            g["perfilador"].dump_stats(rutas[-1])
+        self.exportar_traza(g["ruta"], self.n - g["inicio"], g["meta"])
+        return rutas
+
+    def exportar_traza(self, ruta, frames, meta=None):
+        # Un evento por frame y, dentro, uno por etapa. Las etapas se
+        # ponen seguidas en el orden de ETAPAS con su tiempo acumulado; el
+        # hueco hasta el siguiente frame es el resto del bucle de eventos.
+        inicios = ventana_circular(self.inicios, self.n)[-frames:]
+        etapas = ventana_circular(self.etapas, self.n)[-frames:]
+        origen = inicios[0] if len(inicios) else 0.0
+        eventos = []
+        for i, (t0, duraciones) in enumerate(zip(inicios, etapas)):
+            ts = 1e6 * (t0 - origen)
+            eventos.append({"name": "frame", "cat": "frame", "ph": "X", "pid": 1, "tid": 1,
+                            "ts": ts, "dur": 1e6 * duraciones.sum(), "args": {"n": i}})
+            for nombre, d in zip(ETAPAS, duraciones):
+                if d > 0:
+                    eventos.append({"name": nombre, "cat": "etapa", "ph": "X", "pid": 1,
+                                    "tid": 1, "ts": ts, "dur": 1e6 * d})
+                    ts += 1e6 * d
+        with open(ruta, "w") as f:
+            json.dump({"traceEvents": eventos, "displayTimeUnit": "ms",
+                       "otherData": dict(meta or {})}, f)
@@ -0,0 +1,80 @@
+# Pruebas sin pantalla de ecuacion_ondas: el esquema contra la solución
+# exacta de un modo propio, la conservación de la energía con extremos
+# fijos y la absorción del contorno de Mur.
+#
+#   python -m pytest -q test_ecuacion_ondas.py
+
+import math
+
+import numpy as np
+import pytest
+
+from ecuacion_ondas import SolverOndas1D, modo_propio, pulso, solucion_modo
+
+LONGITUD = math.pi
+C = 1.0
+
+
+def _malla(n):
+    return np.linspace(0, LONGITUD, n)
+
+
+def _error_modo(n_puntos, contorno, gamma, modo=3, segundos=2.0):
+    # Error máximo contra solucion_modo en el instante del último paso
+    x = _malla(n_puntos)
+    solver = SolverOndas1D(x, C, gamma, contorno)
+    solver.iniciar(modo_propio(x, modo, contorno)[0])
+    solver.avanzar(segundos)
+    exacta = solucion_modo(x, solver.t, modo, C, contorno, gamma)
+    return np.abs(solver.u - exacta).max()
+
+
+@pytest.mark.parametrize("contorno", ["fijo", "libre"])
+@pytest.mark.parametrize("gamma", [0.0, 0.5])
+def test_modo_propio(contorno, gamma):
+    assert _error_modo(2001, contorno, gamma) < 1e-5
+
+
+@pytest.mark.parametrize("contorno", ["fijo", "libre"])
+def test_segundo_orden(contorno):
+    # Con la mitad de dx (y de dt) el error baja unas cuatro veces
+    grueso = _error_modo(201, contorno, 0.0)
+    fino = _error_modo(401, contorno, 0.0)
+    assert 3.5 < grueso / fino < 4.5
+
+
+def test_energia_extremos_fijos():
+    x = _malla(2001)
+    solver = SolverOndas1D(x, C, 0.0, "fijo")
+    solver.iniciar(pulso(x, LONGITUD / 4, 0.1))
+    inicial = solver.energia()
+    # Varias idas y vueltas del pulso, con reflexiones en los dos extremos
+    solver.avanzar(5 * LONGITUD / C)
+    assert abs(solver.energia() / inicial - 1) < 1e-6
+
+
+def test_amortiguamiento_disipa_energia():
+    x = _malla(1001)
+    solver = SolverOndas1D(x, C, 0.5, "fijo")
+    solver.iniciar(pulso(x, LONGITUD / 2, 0.1))
+    inicial = solver.energia()
+    solver.avanzar(2 * LONGITUD / C)
+    assert solver.energia() < 0.5 * inicial
+
+
+def test_contorno_absorbente():
+    # El pulso se parte en dos que salen por los extremos; lo que queda es
+    # lo que el contorno de Mur refleja
+    x = _malla(2001)
+    solver = SolverOndas1D(x, C, 0.0, "absorbente")
+    solver.iniciar(pulso(x, LONGITUD / 2, 0.1))
+    inicial = solver.energia()
+    solver.avanzar(2 * LONGITUD / C)
+    assert solver.energia() / inicial < 1e-12
+
+
+def test_velocidad_invalida():
+    with pytest.raises(ValueError):
+        SolverOndas1D(_malla(11), 0.0)
+    with pytest.raises(ValueError):
+        SolverOndas1D(_malla(11), math.inf)